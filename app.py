@@ -2,8 +2,14 @@ import streamlit as st
 import tempfile
 import os
 import re 
+import uuid
 from src.core.reasoning_engine import AdaptiveAgent
-from src.utils.network import NetworkSentinel
+from src.utils.scheduler import get_scheduler
+from src.utils.single_flight import flight_stats
+from src.utils.cancel import waste_stats
+from src.utils.load_governor import get_governor
+from src.utils.usage import get_ledger, usage_summary
+from src.utils.network import get_sentinel
 
 # # 1. Page Config
 # st.set_page_config(
@@ -68,6 +74,9 @@ if "agent" not in st.session_state:
     st.session_state.agent = AdaptiveAgent()
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    # Keys this chat's memory and its fair share of the API scheduler
+    st.session_state.session_id = uuid.uuid4().hex
 
 # 3. Sidebar: Control Center
 with st.sidebar:
@@ -75,13 +84,18 @@ with st.sidebar:
     st.markdown("---")
     
     st.write("### Network Sentinel")
-    sentinel = NetworkSentinel()
-    latency = sentinel.ping()
+    # Cached readings from the background sentinel: reruns never wait on a probe
+    sentinel = get_sentinel()
+    latency = sentinel.latency()
     auto_mode = sentinel.get_mode() # Get what the network thinks we should do
     
     col1, col2 = st.columns(2)
-    col1.metric("Latency", f"{int(latency)}ms")
+    col1.metric("Latency", f"{int(latency)}ms" if latency is not None else "...")
     col2.metric("Auto Mode", auto_mode.split('_')[0][:].upper())
+    with st.expander("Network Details"):
+        st.json(sentinel.snapshot())
+        if st.button("Diagnose (DNS / connect / TLS / TTFB)", use_container_width=True):
+            st.json(sentinel.diagnose())
     
     st.markdown("---")
     
@@ -93,6 +107,11 @@ with st.sidebar:
         index=0,
         help="Force a specific reasoning mode or let the network decide."
     )
+    st.session_state.agent.cascade = st.checkbox(
+        "Model Cascade (Small → Large)",
+        value=st.session_state.agent.cascade,
+        help="Deep answers are drafted by the small model and only escalated to the large model when the draft scores low."
+    )
     # ------------------------------------
 
     st.markdown("---")
@@ -105,6 +124,25 @@ with st.sidebar:
             st.session_state.agent.upload_document(tmp.name)
         st.success("Context Loaded")
 
+    # Clicking reruns the script, which also stops rendering the old answer
+    if st.button("⏹ Stop Answer", use_container_width=True):
+        st.session_state.agent.cancel(st.session_state.session_id)
+
+    with st.expander("API Traffic"):
+        st.json({
+            "load": get_governor().snapshot(),
+            "scheduler": get_scheduler().snapshot(),
+            "coalesced": flight_stats(),
+            "cancelled": waste_stats(),
+            "search_cache": st.session_state.agent.web.cache.snapshot(),
+        })
+
+    with st.expander("Token Usage"):
+        st.json({
+            "this_session": get_ledger().session_usage(st.session_state.session_id),
+            "all_sessions": usage_summary(),
+        })
+
 # 4. Main UI Logic
 st.markdown('# Adaptive Reasoning Agent')
 st.caption("Mistral-powered agent with network-aware reasoning and native RAG.")
@@ -141,12 +179,17 @@ if prompt := st.chat_input("Ask a question..."):
             full_response = ""
             
             # --- PASS USER STRATEGY HERE ---
-            stream_gen = st.session_state.agent.execute_stream(prompt, user_strategy)
+            stream_gen = st.session_state.agent.execute_stream(prompt, user_strategy, st.session_state.session_id)
             # -------------------------------
             
             for chunk in stream_gen:
                 if chunk.data.choices[0].delta.content:
                     content = chunk.data.choices[0].delta.content
+                    # Document generation reports progress through a hidden tag
+                    progress_match = re.fullmatch(r"\[\[PROGRESS:(.*?)\]\]", content)
+                    if progress_match:
+                        status_placeholder.update(label=progress_match.group(1))
+                        continue
                     full_response += content
                     placeholder.markdown(full_response + "▌")
             
@@ -0,0 +1,151 @@
+"""
+Headless batch runner: pushes a JSONL file of queries through AdaptiveAgent.
+
+    python batch_runner.py --input requests.jsonl --output results.jsonl --concurrency 16 --mode standard
+
+Each input line is a JSON object. The query is taken from "query" (or
+"title" + "body"), the id from "id" / "request_id" (or the line number).
+Every finished query is appended to the output file immediately, so an
+interrupted run picks up where it stopped: ids that already have a
+successful result in the output are skipped on the next start. Failed and
+shed queries are written with an "error" and retried (appended again).
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from src.core.reasoning_engine import AdaptiveAgent
+from src.utils.async_bridge import run_sync
+from src.utils.cassette import configure_cassette
+
+# CLI mode names -> the override strings the agent understands (same as the UI radio)
+MODES = {
+    "auto": "Auto (Network)",
+    "deep": "Deep Reasoning",
+    "standard": "Standard",
+    "fast": "Fast Response",
+}
+
+
+def load_queries(path):
+    """Yields (id, query, record) for every usable line of the input JSONL."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[BATCH] ⚠️ Skipping line {line_no}: {e}")
+                continue
+
+            query = record.get("query")
+            if not query:
+                query = "\n\n".join(record[k] for k in ("title", "body") if record.get(k))
+            if not query:
+                print(f"[BATCH] ⚠️ Skipping line {line_no}: no query text.")
+                continue
+            query_id = str(record.get("id") or record.get("request_id") or line_no)
+            yield query_id, query, record
+
+
+def load_done(path):
+    """Ids that already have a successful result in `path` (the resume set). Errored ones get redone."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut off by the interruption; it gets redone
+            if "id" in result and not result.get("error"):
+                done.add(result["id"])
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+async def run_one(agent, query_id, query, mode, out, semaphore, stats):
+    async with semaphore:
+        trace = {}
+        parts = []
+        error = None
+        try:
+            async for chunk in agent.execute_stream_async(query, mode, session_id=None, trace=trace):
+                content = chunk.data.choices[0].delta.content
+                if content and not content.startswith("[[PROGRESS:"):
+                    parts.append(content)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"[BATCH] ❌ {query_id} failed: {error}")
+        if trace.get("shed"):
+            # The capacity notice is not an answer
+            error = "Shed: the agent was at capacity"
+            print(f"[BATCH] ❌ {query_id} shed by the load governor (lower --concurrency).")
+
+    result = {"id": query_id, "query": query, "answer": "".join(parts), "error": error, "trace": trace}
+    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    out.flush()
+
+    stats["failed" if error else "ok"] += 1
+    if "total_ms" in trace:
+        stats["latencies"].append(trace["total_ms"])
+    print(f"[BATCH] {query_id} done in {trace.get('total_ms', 0):.0f}ms ({stats['ok'] + stats['failed']}/{stats['total']})")
+
+
+async def run_batch(args):
+    done = load_done(args.output)
+    todo = [(qid, q) for qid, q, _ in load_queries(args.input) if qid not in done]
+    print(f"[BATCH] {len(todo)} queries to run ({len(done)} already done) | concurrency {args.concurrency} | mode {args.mode}")
+
+    agent = AdaptiveAgent()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {"ok": 0, "failed": 0, "total": len(todo), "latencies": []}
+    started = time.monotonic()
+
+    with open(args.output, "a", encoding="utf-8") as out:
+        if out.tell() and not _ends_with_newline(args.output):
+            out.write("\n")  # Terminate a line cut off by the interruption
+        await asyncio.gather(*(
+            run_one(agent, qid, query, MODES[args.mode], out, semaphore, stats) for qid, query in todo
+        ))
+
+    elapsed = time.monotonic() - started
+    latencies = sorted(stats["latencies"])
+    p50 = latencies[len(latencies) // 2] if latencies else 0
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0
+    print(f"[BATCH] ✅ {stats['ok']} ok, {stats['failed']} failed in {elapsed:.1f}s "
+          f"({len(todo) / elapsed if elapsed else 0:.2f} queries/s) | p50 {p50:.0f}ms, p95 {p95:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through the Adaptive Reasoning Agent.")
+    parser.add_argument("--input", required=True, help="JSONL file of queries")
+    parser.add_argument("--output", required=True, help="JSONL file for results (appended to; enables resume)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight at once (default: 8)")
+    parser.add_argument("--mode", choices=list(MODES), default="standard", help="Reasoning mode to force (default: standard)")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record every outbound call to this cassette file")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Serve every outbound call from this cassette file (offline)")
+    parser.add_argument("--fast-replay", action="store_true", help="With --replay: skip recorded delays to profile our own overhead")
+    args = parser.parse_args()
+
+    # Must happen before the agent (and its shared HTTP pool) is created
+    if args.record:
+        configure_cassette("record", args.record)
+    elif args.replay:
+        configure_cassette("replay", args.replay, timing="fast" if args.fast_replay else "original")
+
+    # Everything runs on the agent's shared event loop, like the UI does
+    run_sync(run_batch(args))
+
+
+if __name__ == "__main__":
+    main()
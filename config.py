@@ -7,4 +7,168 @@ load_dotenv()
 LATENCY_THRESHOLD_FAST = 300  # Below this = Deep Reasoning allowed
 LATENCY_THRESHOLD_POOR = 1000 # Above this = Panic Mode (Fastest possible)
 
-MISTRAL_API_KEY = "your_mistral_api_key_here"
\ No newline at end of file
+# Network Sentinel (background probing; requests only read its cached verdict)
+SENTINEL_PROBE_INTERVAL = 10.0  # Seconds between probes
+SENTINEL_EWMA_ALPHA = 0.3       # Weight of the newest probe in the latency EWMA
+SENTINEL_WINDOW = 30            # Recent probe rounds decisions are made over
+# Probed concurrently each round; the Mistral API host is the one our answers actually depend on
+SENTINEL_TARGETS = ["https://api.mistral.ai", "https://1.1.1.1"]
+SENTINEL_PROBE_TIMEOUT = 2.0    # Seconds; a target that does not answer in time counts as failed for the round
+# How a target is probed:
+#   "keepalive" - HEAD over the shared pool's warm connection: steady-state RTT, cheapest on the server
+#   "tcp"       - TCP connect only: one round trip, no TLS or HTTP work on either side
+#   "phases"    - a fresh connection timed as DNS / connect / TLS / TTFB: shows where slowness comes from
+SENTINEL_PROBE_MODE = os.getenv("AGENT_SENTINEL_PROBE_MODE", "keepalive")
+SENTINEL_HYSTERESIS = 0.2       # Modes change only once latency is this far (as a share) past a threshold
+SENTINEL_MIN_TAIL_SAMPLES = 10  # Rounds needed before p90 may veto Deep Reasoning
+# Passive measurements from real Mistral calls, blended into the same window as probes.
+# On a pooled connection a call is one round trip plus server time; the server time is estimated
+# per model as (fixed ms, ms per 1k prompt tokens of prefill) and subtracted first.
+SENTINEL_SERVER_BASELINE = {
+    "mistral-small-latest": (200, 25),
+    "mistral-large-latest": (400, 75),
+    "mistral-embed": (50, 10),
+    "default": (300, 50),
+}
+SENTINEL_MIN_TOKENS_PER_SECOND = 20  # Median stream throughput below this rules out Deep Reasoning
+SENTINEL_THROUGHPUT_WINDOW = 5       # Recent answer streams that median is taken over (streams are rarer than probes)
+SENTINEL_PASSIVE_FRESH = 30.0        # Passive data younger than this (s) lets active probing back off...
+SENTINEL_MAX_PROBE_INTERVAL = 120.0  # ...doubling the interval up to this many seconds
+
+MISTRAL_API_KEY = "your_mistral_api_key_here"
+MISTRAL_SERVER_URL = os.getenv("AGENT_MISTRAL_SERVER_URL")  # None = the real API; set to point at a stand-in
+
+# Tool Fan-out (in seconds)
+WEB_TOOL_TIMEOUT = 6.0  # DuckDuckGo is the slowest tool; give up and answer without it
+RAG_TOOL_TIMEOUT = 4.0  # One embedding call + local cosine math
+
+# Shared HTTP Pool
+HTTP_POOL_MAX_CONNECTIONS = 100  # Hard cap across all hosts
+HTTP_POOL_MAX_KEEPALIVE = 20     # Idle sockets kept open for reuse
+HTTP_POOL_KEEPALIVE_EXPIRY = 60  # Seconds an idle socket survives
+HTTP_WARM_UP_URLS = ["https://api.mistral.ai", "https://1.1.1.1"]
+
+# Intent Routing
+INTENT_CONFIDENCE_THRESHOLD = 0.6  # Below this the local classifier defers to the LLM router
+
+# Speculative Tools (started while the LLM router is still deciding)
+SPECULATIVE_TOOLS = True
+SPECULATION_WINDOW = 20  # Recent speculative launches remembered per mode
+SPECULATION_WASTE_CAP = {  # Max discarded launches in that window before a mode stops speculating
+    "FAST_RESPONSE": 2,
+    "STANDARD": 5,
+    "DEEP_REASONING": 8,
+}
+
+# Semantic Response Cache (FAST_RESPONSE and STANDARD only)
+RESPONSE_CACHE_THRESHOLD = 0.95  # Cosine similarity for two queries to count as the same question
+RESPONSE_CACHE_TTL = 900         # Seconds a cached answer stays valid
+RESPONSE_CACHE_WEB_TTL = 60      # Answers built on live web data go stale fast
+RESPONSE_CACHE_MAX_ENTRIES = 512
+
+# Web Search Cache (raw DDGS results, served stale while a refresh runs in the background)
+WEB_CACHE_MAX_ENTRIES = 256
+# Seconds results stay fresh, by query category (first match wins; news searches use at most "news")
+WEB_CACHE_TTLS = {"markets": 60, "news": 300, "weather": 900, "general": 3600}
+WEB_CACHE_CATEGORIES = {
+    "markets": ["stock", "price", "bitcoin", "crypto", "exchange rate", "market"],
+    "news": ["news", "latest", "today", "breaking", "live"],
+    "weather": ["weather", "forecast", "temperature"],
+}
+WEB_CACHE_STALE_FACTOR = 3  # Past its TTL, an entry is served (and refreshed) for up to this many TTLs more
+
+# Latency SLOs: end-to-end deadline per reasoning mode (in seconds)
+MODE_DEADLINES = {
+    "FAST_RESPONSE": 1.5,
+    "STANDARD": 5.0,
+    "DEEP_REASONING": 20.0,
+}
+ROUTER_MIN_BUDGET = 0.5      # Only consult the LLM router if this much is left
+TOOL_BUDGET_SHARE = 0.5      # Tools may spend at most this share of the remaining budget
+MIN_TOOL_BUDGET = 0.25       # Below this a tool is skipped instead of started
+GENERATION_TOKENS_PER_SECOND = 60  # Conservative decode speed (incl. first-token wait) for sizing max_tokens
+MODE_MAX_TOKENS = {
+    "FAST_RESPONSE": 256,
+    "STANDARD": 1024,
+    "DEEP_REASONING": 4096,
+}
+MIN_MAX_TOKENS = 64
+# Grace for answers the earlier stages left too little budget for (scales with each mode's deadline):
+STREAM_GRACE_SHARE = 0.5       # The first token, and then the rest of the answer, each get this share of the budget
+FIRST_TOKEN_RTT_MULTIPLE = 2   # ...but the first token gets at least this many measured round trips: it cannot beat the link
+
+# Model Cascade: draft with mistral-small, escalate to mistral-large only when the draft scores low
+MODEL_CASCADE = False  # Off by default: every escalated answer waits on a full small-model draft first. The UI opts in.
+CASCADE_ESCALATION_THRESHOLD = 0.7  # Draft quality score (0..1) needed to skip the large model
+
+# Conversation Memory (constant-size history in every prompt)
+MEMORY_TOKEN_BUDGET = 1200     # Max tokens of history (summary + recent turns) per prompt
+MEMORY_VERBATIM_TURNS = 3      # Most recent turns kept word for word
+MEMORY_SUMMARY_TOKENS = 300    # Cap on the rolling summary of everything older
+MEMORY_MAX_SESSIONS = 256      # Idle conversations beyond this are forgotten (LRU)
+
+# Record / Replay Cassettes (reproducible performance runs)
+CASSETTE_MODE = os.getenv("AGENT_CASSETTE_MODE")  # None (live), "record" or "replay"
+CASSETTE_PATH = os.getenv("AGENT_CASSETTE_PATH", "data/cassettes/session.jsonl.gz")
+CASSETTE_REPLAY_TIMING = os.getenv("AGENT_CASSETTE_TIMING", "original")  # "original" or "fast"
+# Volatile request fragments ignored when matching a request to its recording
+CASSETTE_SCRUB_PATTERNS = [r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}"]
+CASSETTE_VOLATILE_FIELDS = ["max_tokens"]  # JSON body fields sized from the deadline, so never the same twice
+
+# Outbound Scheduler (provider rate limits, shared by every session)
+# Per model: (requests per second, burst). Set to your Mistral plan's limits.
+SCHEDULER_RATE_LIMITS = {
+    "mistral-small-latest": (5.0, 10),
+    "mistral-large-latest": (2.0, 4),
+    "mistral-embed": (5.0, 10),
+}
+SCHEDULER_DEFAULT_RATE = (2.0, 4)
+# Lower number = served first. Background = ingestion and memory summaries.
+SCHEDULER_PRIORITIES = {
+    "FAST_RESPONSE": 0,
+    "STANDARD": 1,
+    "DEEP_REASONING": 2,
+    "BACKGROUND": 3,
+}
+
+# Load Governor (protects our own server, on top of the network-based mode)
+GOVERNOR_MAX_IN_FLIGHT = 32      # Requests processed at once; the rest wait in line
+GOVERNOR_MAX_QUEUE = 64          # Requests allowed to wait; beyond this new ones are shed
+GOVERNOR_QUEUE_TIMEOUT = 2.0     # Seconds a request may wait for a slot before it is shed
+GOVERNOR_QUEUE_DEPTH_HIGH = 20   # Calls waiting in the API scheduler that count as "high load"
+GOVERNOR_WAIT_HIGH = 1.0         # Seconds of admission wait (EWMA) that count as "high load"
+GOVERNOR_CPU_HIGH = 0.9          # Share of one core used by this process that counts as "high load" (one event loop, one GIL)
+GOVERNOR_CPU_WINDOW = 1.0        # Seconds of process CPU time averaged per measurement
+# Pressure score (1.0 = high load) to enter / leave each level. The gap is the hysteresis.
+GOVERNOR_ELEVATED = (0.7, 0.5)   # DEEP_REASONING -> STANDARD
+GOVERNOR_HIGH = (1.0, 0.8)       # Everything -> FAST_RESPONSE
+GOVERNOR_MIN_DWELL = 5.0         # Seconds a level holds before stepping down
+
+# Long Documents: outline first, then sections written in parallel (PDF / Word only)
+LONG_DOC_KEYWORDS = ["report", "detailed", "comprehensive", "in-depth", "chapters", "sections", "long"]
+LONG_DOC_MAX_SECTIONS = 20
+LONG_DOC_CONCURRENCY = 5        # Sections generated at once (each is one mistral-large stream)
+LONG_DOC_SECTION_TOKENS = 900   # max_tokens per section
+
+# Token Accounting & Budgets
+# Approximate list prices in USD per 1M tokens: (input, output). Update to your plan.
+MODEL_PRICES = {
+    "mistral-small-latest": (0.1, 0.3),
+    "mistral-large-latest": (2.0, 6.0),
+    "mistral-embed": (0.1, 0.0),
+}
+# Prompt budget per answer call, enforced before the call: retrieved context is trimmed first, then history.
+# Completion tokens are capped by MODE_MAX_TOKENS.
+MODE_PROMPT_BUDGETS = {
+    "FAST_RESPONSE": 2000,
+    "STANDARD": 6000,
+    "DEEP_REASONING": 16000,
+}
+USAGE_RECENT_REQUESTS = 1000  # Per-request usage records kept for lookup
+
+# Network Emulation (scenario_runner.py)
+EMULATOR_RETRANSMIT_PENALTY = 0.2  # Seconds a lost packet costs (doubling per repeated loss)
+SCENARIO_PROBE_INTERVAL = 0.1      # Sentinel probe interval during scenarios (seconds)
+SCENARIO_WINDOW = 10               # Sentinel window during scenarios (rounds; >= SENTINEL_MIN_TAIL_SAMPLES)
+SCENARIO_THROUGHPUT_WINDOW = 3     # Streams the throughput median is taken over (fits in one phase's queries)
+SCENARIO_SETTLE_TIMEOUT = 30.0     # Max wait (s) for the sentinel's window to refill after a network change
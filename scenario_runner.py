@@ -0,0 +1,173 @@
+"""
+Network scenario runner: checks how the agent adapts to network conditions
+without changing networks.
+
+    python scenario_runner.py                       # every scenario
+    python scenario_runner.py --scenario degrading --queries 5
+
+A local stand-in server plays the Mistral API (and the sentinel's probe
+target), DuckDuckGo is replaced by canned results, and the network
+emulator injects each phase's latency, jitter, loss, failures and
+bandwidth cap into all of it. Per phase the runner waits for the sentinel
+to settle, sends queries in Auto mode, and asserts that the sentinel and
+the last query ended up in the expected mode without flapping (going back
+to a mode it had left). Some conditions only show under traffic (a
+bandwidth cap shows in stream throughput, not in probes), so the check is
+on where the phase ends. Every query must also have streamed an answer.
+The load governor is pinned to NORMAL for the run, so the host's CPU never
+changes a mode.
+It prints end-to-end latency per phase and exits non-zero if any check
+failed.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from config import SCENARIO_PROBE_INTERVAL, SCENARIO_WINDOW, SCENARIO_THROUGHPUT_WINDOW, SCENARIO_SETTLE_TIMEOUT
+from src.core.reasoning_engine import AdaptiveAgent, NO_ANSWER_NOTICE
+from src.utils.async_bridge import run_sync
+from src.utils.http_pool import HttpPool
+from src.utils.load_governor import get_governor
+from src.utils.net_emulator import NetworkConditions, StandInServer, StandInSearch, configure_emulator
+from src.utils.network import get_sentinel
+
+FIBER = NetworkConditions("fiber", latency_ms=40, jitter_ms=5)
+DSL = NetworkConditions("dsl", latency_ms=700, jitter_ms=80)
+CONGESTED = NetworkConditions("congested", latency_ms=1800, jitter_ms=300, distribution="lognormal")
+LOSSY = NetworkConditions("lossy", latency_ms=60, jitter_ms=40, loss=0.1, failure_rate=0.05)
+THROTTLED = NetworkConditions("throttled", latency_ms=80, jitter_ms=10, bandwidth_kbps=8)
+
+# Scenario -> phases of (network, mode the agent must settle on)
+SCENARIOS = {
+    "fiber": [(FIBER, "DEEP_REASONING")],
+    "dsl": [(DSL, "STANDARD")],
+    "congested": [(CONGESTED, "FAST_RESPONSE")],
+    "lossy": [(LOSSY, "DEEP_REASONING")],  # Loss and failed calls are outliers, not a slow network
+    # Probes are too small to notice a bandwidth cap; answer streams do, once the link is throttled
+    "throttled": [(FIBER, "DEEP_REASONING"), (THROTTLED, "STANDARD")],
+    "degrading": [(FIBER, "DEEP_REASONING"), (DSL, "STANDARD"), (CONGESTED, "FAST_RESPONSE"), (FIBER, "DEEP_REASONING")],
+}
+
+QUERIES = [
+    "Explain how {n} vaccines train the immune system",
+    "What is the weather in city {n} today",
+    "How do {n} sorting algorithms differ in complexity",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0
+
+
+async def run_query(agent, query):
+    trace = {}
+    parts = []
+    async for chunk in agent.execute_stream_async(query, "Auto (Network)", session_id=None, trace=trace):
+        parts.append(chunk.data.choices[0].delta.content or "")
+    trace["answer"] = "".join(parts)
+    return trace
+
+
+async def run_phase(agent, sentinel, emulator, conditions, expected, queries, counter):
+    emulator.set_conditions(conditions)
+    started = time.monotonic()
+    # Settled = the window holds only rounds measured on the new network
+    probes = sentinel.counts["probes"]
+    while sentinel.counts["probes"] - probes <= SCENARIO_WINDOW and time.monotonic() - started < SCENARIO_SETTLE_TIMEOUT:
+        await asyncio.sleep(SCENARIO_PROBE_INTERVAL)
+    settled = sentinel.get_mode()
+
+    traces = []
+    for _ in range(queries):
+        counter[0] += 1
+        query = QUERIES[counter[0] % len(QUERIES)].format(n=counter[0])  # Fresh each time: no cache hits
+        traces.append(await run_query(agent, query))
+
+    final = sentinel.get_mode()
+    path = [settled_from for at, settled_from, _ in sentinel.transitions if at >= started][:1]
+    path += [to for at, _, to in sentinel.transitions if at >= started]
+    flapped = len(path) != len(set(path))
+    modes = [t.get("mode") for t in traces]
+    latencies = [t["total_ms"] for t in traces if "total_ms" in t]
+    first_tokens = [t["first_token_ms"] for t in traces if "first_token_ms" in t]
+    unanswered = sum(1 for t in traces if "first_token_ms" not in t or t["answer"].strip() in ("", NO_ANSWER_NOTICE))
+
+    failures = []
+    if final != expected:
+        failures.append(f"sentinel ended on {final}")
+    if modes and modes[-1] != expected:
+        failures.append(f"queries ran as {modes}")
+    if flapped:
+        failures.append(f"flapped: {' -> '.join(path)}")
+    if unanswered:
+        failures.append(f"{unanswered}/{len(traces)} queries streamed no answer")
+
+    return {
+        "network": conditions.name,
+        "expected": expected,
+        "settled": settled,
+        "final": final,
+        "query_modes": modes,
+        "transitions": path,
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "first_token_p50_ms": percentile(first_tokens, 0.5),
+        "sentinel": sentinel.snapshot(),
+        "failures": failures,
+    }
+
+
+async def run_scenarios(names, queries):
+    server = StandInServer().start()
+    emulator = configure_emulator(FIBER)
+
+    # Built after the emulator is on, so every client is wrapped by it
+    pool = HttpPool(server_url=server.url)
+    pool.ddgs = StandInSearch()
+    # Two targets, like production: one failed probe must not decide a round
+    sentinel = get_sentinel(pool=pool, targets=[server.url, f"{server.url}/health"], interval=SCENARIO_PROBE_INTERVAL,
+                            window=SCENARIO_WINDOW, passive_fresh=SCENARIO_PROBE_INTERVAL * 5,
+                            server_baseline=server.server_baseline(), throughput_window=SCENARIO_THROUGHPUT_WINDOW)
+    agent = AdaptiveAgent(pool=pool)
+    # Mode choice here is the sentinel's alone: the governor would downgrade on
+    # this host's CPU, which makes the verdicts depend on the machine
+    governor = get_governor()
+    governor.pinned = "NORMAL"
+
+    results = {}
+    counter = [0]
+    for name in names:
+        print(f"\n[SCENARIO] ▶️ {name}")
+        sentinel.reset()
+        results[name] = []
+        for conditions, expected in SCENARIOS[name]:
+            phase = await run_phase(agent, sentinel, emulator, conditions, expected, queries, counter)
+            results[name].append(phase)
+            verdict = "✅" if not phase["failures"] else "❌ " + "; ".join(phase["failures"])
+            print(f"[SCENARIO] {name}/{phase['network']}: {' -> '.join(phase['transitions']) or phase['final']} "
+                  f"(expected {expected}) | "
+                  f"p50 {phase['p50_ms']:.0f}ms, p95 {phase['p95_ms']:.0f}ms, "
+                  f"first token p50 {phase['first_token_p50_ms']:.0f}ms | {verdict}")
+
+    governor.pinned = None
+    server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the agent through emulated network scenarios.")
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="all", help="Scenario to run (default: all)")
+    parser.add_argument("--queries", type=int, default=3, help="Auto-mode queries per phase (default: 3)")
+    args = parser.parse_args()
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = run_sync(run_scenarios(names, args.queries))
+
+    failed = [(name, p["network"]) for name, phases in results.items() for p in phases if p["failures"]]
+    print(f"\n[SCENARIO] {sum(len(p) for p in results.values()) - len(failed)} phases passed, {len(failed)} failed.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
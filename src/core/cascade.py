@@ -0,0 +1,72 @@
+import re
+
+CONFIDENCE_INSTRUCTION = (
+    "\n    After the answer, on its own final line, write CONFIDENCE: <a number from 0 to 1> "
+    "stating how sure you are that the answer is complete and correct."
+)
+
+# Tolerates markdown emphasis ("**CONFIDENCE:** 0.9") and percentages ("Confidence: 90%")
+CONFIDENCE_LINE = re.compile(r"\n?[ \t>*_]*CONFIDENCE[*_ \t]*:[*_ \t]*(\d+(?:\.\d+)?)[ \t]*(%?)[*_. \t]*$", re.IGNORECASE)
+WORD = re.compile(r"[a-z0-9]{4,}")
+
+
+def split_confidence(answer):
+    """Returns (answer without the CONFIDENCE line, reported confidence or None)."""
+    match = CONFIDENCE_LINE.search(answer.rstrip())
+    if not match:
+        return answer.strip(), None
+    value = float(match.group(1))
+    if match.group(2) or value > 1:
+        value /= 100
+    return answer[:match.start()].strip(), min(1.0, value)
+
+
+def score_answer(answer, confidence, context, min_length=400):
+    """
+    Blends three cheap signals into a 0..1 quality score for a small-model draft:
+    - self-reported confidence (a draft that did not report one fails the check),
+    - length: a DEEP answer shorter than `min_length` chars is probably thin,
+    - grounding: share of the answer's content words that appear in the
+      retrieved context (only when there is context to check against).
+    """
+    if confidence is None:
+        return 0.0
+    length = min(1.0, len(answer) / min_length)
+
+    if not context.strip():
+        return 0.6 * confidence + 0.4 * length
+
+    answer_words = set(WORD.findall(answer.lower()))
+    context_words = set(WORD.findall(context.lower()))
+    grounding = len(answer_words & context_words) / len(answer_words) if answer_words else 0.0
+    return 0.5 * confidence + 0.2 * length + 0.3 * grounding
+
+
+class CascadeStats:
+    """Running escalation rate and latency saved, logged after every cascaded query."""
+
+    def __init__(self):
+        self.kept = 0
+        self.escalated = 0
+        self.small_seconds = 0.0  # Time spent on small-model drafts
+        self.large_seconds = 0.0  # Time spent on large-model answers after escalation
+        self.saved_seconds = 0.0  # Estimated large-model time avoided by kept drafts
+
+    def record(self, escalated, small_seconds, large_seconds=0.0):
+        self.small_seconds += small_seconds
+        if escalated:
+            self.escalated += 1
+            self.large_seconds += large_seconds
+        else:
+            self.kept += 1
+            # Estimate what the large model would have cost from what it costs when we do use it
+            if self.escalated:
+                self.saved_seconds += (self.large_seconds / self.escalated) - small_seconds
+
+    def escalation_rate(self):
+        total = self.kept + self.escalated
+        return self.escalated / total if total else 0.0
+
+    def summary(self):
+        return (f"escalation rate {self.escalation_rate():.0%} ({self.escalated}/{self.kept + self.escalated}) | "
+                f"est. latency saved {self.saved_seconds:.1f}s")
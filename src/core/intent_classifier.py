@@ -0,0 +1,145 @@
+import re
+from collections import OrderedDict
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+# Hand-labelled seed queries. Small on purpose: the model only has to beat the
+# LLM router on the obvious cases, anything ambiguous still goes to the LLM.
+SEED_QUERIES = {
+    "WEB": [
+        "what is the weather in lahore today",
+        "latest news on quantum computing",
+        "current bitcoin price",
+        "tesla stock price right now",
+        "who won the match last night",
+        "breaking news headlines",
+        "what happened in the election today",
+        "exchange rate of usd to pkr",
+        "weather forecast for this weekend",
+        "latest updates on the ai act",
+        "is it going to rain tomorrow",
+        "trending topics on the internet this week",
+    ],
+    "RAG": [
+        "summarize the uploaded document",
+        "what does the paper say about the results",
+        "according to the pdf what is the conclusion",
+        "key findings of this paper",
+        "what is mentioned in the document about pricing",
+        "explain section 3 of the file i uploaded",
+        "list the main points from my notes",
+        "what methodology does the report use",
+        "find the definition of latency in the document",
+        "what are the limitations discussed in the paper",
+        "who are the authors of this document",
+        "quote the abstract of the uploaded pdf",
+    ],
+    "DOC": [
+        "create a pdf report on climate change",
+        "generate an excel sheet comparing apple google and microsoft revenue",
+        "make a word document about project management",
+        "save this as a pdf",
+        "export the results to a spreadsheet",
+        "write a docx file on machine learning basics",
+        "download a csv of the top 10 countries by population",
+        "create a document summarizing renewable energy",
+        "generate a report file on cyber security",
+        "build a spreadsheet of monthly expenses",
+        "prepare a pdf brochure for our product",
+        "put this into a word file",
+    ],
+    "NONE": [
+        "what is the capital of france",
+        "explain how neural networks learn",
+        "write a poem about the sea",
+        "what is the difference between tcp and udp",
+        "how do i reverse a list in python",
+        "tell me a joke",
+        "why is the sky blue",
+        "explain the theory of relativity simply",
+        "give me tips to improve my sleep",
+        "what is recursion",
+        "translate good morning to spanish",
+        "how does photosynthesis work",
+        "how do i make a pdf smaller",
+        "explain how to export data to excel in pandas",
+        "write the word hello in french",
+    ],
+}
+
+# Words that may sit between a request verb and the document type it asks for
+_FILLER = r"(?:(?:a|an|the|this|that|it|these|them|me|us|my|our|into|to|as|in|new|short|simple|quick|detailed|full|results|data|table|list|summary|answer)\s+){0,4}"
+_DOC_TYPE = r"(?:pdf|excel|spreadsheet|docx|csv|xlsx|word (?:document|doc|file))"
+
+# Keyword rules: (intent, pattern, confidence). First match wins, so DOC comes
+# before WEB ("create a pdf about today's news" is a DOC request).
+# Only unambiguous phrasings are confident enough to skip the LLM router; the
+# rest score below INTENT_CONFIDENCE_THRESHOLD so the router confirms them
+# ("price elasticity" is not a market question, "open the file in python" not RAG).
+KEYWORD_RULES = [
+    # An imperative file request: the verb opens the query and the document type is its object
+    ("DOC", re.compile(r"^(?:please\s+)?(?:(?:can|could) you\s+)?(?:create|generate|make|export|download|save|write|build|prepare|put)\s+"
+                       + _FILLER + _DOC_TYPE + r"\b"), 0.97),
+    ("RAG", re.compile(r"\b(uploaded|my (notes|file|document|pdf)|this (paper|document|pdf|file)|the (paper|document))\b"), 0.9),
+    ("WEB", re.compile(r"\b(weather|forecast|news|headlines|today|tonight|latest|right now)\b"), 0.9),
+    ("RAG", re.compile(r"\bthe (pdf|file)\b"), 0.5),
+    ("WEB", re.compile(r"\b(stock|stocks|price|prices|current)\b"), 0.5),
+]
+
+
+def normalize_query(query):
+    """Lowercase, strip punctuation and collapse whitespace so trivial variants share a memo slot."""
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+
+class IntentClassifier:
+    """
+    CPU-only intent router: keyword rules first, then a TF-IDF + logistic
+    regression model trained on SEED_QUERIES at startup (a few ms).
+    Returns (intent, confidence); callers fall back to the LLM router when the
+    confidence is below their threshold.
+    """
+
+    def __init__(self, memo_size=2048):
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)
+        self.model = LogisticRegression(max_iter=1000, C=5.0)
+        self.memo = OrderedDict()  # normalized query -> intent (LRU)
+        self.memo_size = memo_size
+        self._train()
+
+    def _train(self):
+        texts, labels = [], []
+        for intent, queries in SEED_QUERIES.items():
+            texts.extend(queries)
+            labels.extend([intent] * len(queries))
+        features = self.vectorizer.fit_transform(texts)
+        self.model.fit(features, labels)
+
+    def classify(self, query):
+        """
+        1. Memo (previous local or LLM verdict)
+        2. Keyword rules
+        3. Linear model
+        """
+        key = normalize_query(query)
+
+        if key in self.memo:
+            self.memo.move_to_end(key)
+            return self.memo[key], 1.0
+
+        for intent, pattern, confidence in KEYWORD_RULES:
+            if pattern.search(key):
+                return intent, confidence
+
+        probabilities = self.model.predict_proba(self.vectorizer.transform([key]))[0]
+        best = probabilities.argmax()
+        return str(self.model.classes_[best]), float(probabilities[best])
+
+    def remember(self, query, intent):
+        """Memoizes the final routing verdict for this normalized query."""
+        key = normalize_query(query)
+        self.memo[key] = intent
+        self.memo.move_to_end(key)
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
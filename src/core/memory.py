@@ -0,0 +1,92 @@
+import asyncio
+from src.utils.tokens import estimate_tokens, trim_to_tokens
+
+
+class ConversationMemory:
+    """
+    Bounded chat history for one conversation.
+    The last `verbatim_turns` exchanges are kept word for word; older ones are
+    folded into a rolling summary by mistral-small in the background, so the
+    history block in the prompt stays under `token_budget` however long the
+    chat gets, and no request ever waits on summarization.
+    """
+
+    def __init__(self, llm, token_budget, verbatim_turns, summary_tokens):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.verbatim_turns = verbatim_turns
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns = []    # Recent (user, assistant) pairs, oldest first
+        self.pending = []  # Evicted turns not folded into the summary yet
+        self._task = None
+
+    def add_turn(self, user_text, assistant_text):
+        """Records a finished exchange. Must be called on the event loop."""
+        self.turns.append((user_text, assistant_text))
+        while len(self.turns) > self.verbatim_turns:
+            self.pending.append(self.turns.pop(0))
+
+        if self.pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._fold_pending())
+
+    def render(self):
+        """History block for the prompt: summary first, then the newest turns that fit."""
+        summary = trim_to_tokens(self.summary, self.summary_tokens)
+        budget = self.token_budget - estimate_tokens(summary)
+
+        # Turns the summarizer has not caught up with yet still count, newest first
+        recent = []
+        for user_text, assistant_text in reversed(self.pending + self.turns):
+            turn = f"User: {user_text}\nAssistant: {assistant_text}"
+            cost = estimate_tokens(turn)
+            if cost > budget:
+                # Keep the start of the newest turn rather than dropping it entirely
+                if not recent and budget > 0:
+                    recent.append(trim_to_tokens(turn, budget) + " ...")
+                break
+            recent.append(turn)
+            budget -= cost
+
+        parts = [f"Summary of earlier conversation: {summary}"] if summary else []
+        parts.extend(reversed(recent))
+        return "\n\n".join(parts)
+
+    async def _fold_pending(self):
+        """Folds evicted turns into the summary, one batch per LLM call."""
+        while self.pending:
+            batch = list(self.pending)
+            turns = "\n\n".join(f"User: {u}\nAssistant: {a}" for u, a in batch)
+            prompt = f"""
+            Update the running summary of a conversation with the new exchanges below.
+            Keep names, numbers, decisions and open questions; drop pleasantries.
+            Write at most {int(self.summary_tokens * 0.75)} words. Output ONLY the updated summary.
+
+            CURRENT SUMMARY: {self.summary or "None"}
+
+            NEW EXCHANGES:
+            {turns}
+            """
+            try:
+                response = await self.llm.complete(
+                    model="mistral-small-latest",
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=self.summary_tokens,
+                    priority="BACKGROUND",
+                    kind="summary"
+                )
+            except Exception as e:
+                # Turns stay pending (and visible in render) until the next attempt
+                print(f"[MEMORY] ⚠️ Summary update failed: {e}")
+                return
+
+            self.summary = (response.choices[0].message.content or self.summary).strip()
+            del self.pending[:len(batch)]
+            print(f"[MEMORY] Folded {len(batch)} turns into summary (~{estimate_tokens(self.summary)} tokens).")
+
+    def clear(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self.summary = ""
+        self.turns = []
+        self.pending = []
@@ -1,33 +1,179 @@
-from mistralai import Mistral
-from src.utils.network import NetworkSentinel
+from src.utils.network import get_sentinel
 from src.tools.native_rag import NativeRAG
 from src.tools.document_tool import DocumentTool
 from src.tools.web_tool import WebSearchTool 
-from config import MISTRAL_API_KEY
+from src.core.intent_classifier import IntentClassifier, normalize_query
+from src.core.response_cache import ResponseCache, context_hash
+from src.core.cascade import CascadeStats, CONFIDENCE_INSTRUCTION, split_confidence, score_answer
+from src.core.memory import ConversationMemory
+from config import (
+    WEB_TOOL_TIMEOUT, RAG_TOOL_TIMEOUT, INTENT_CONFIDENCE_THRESHOLD,
+    SPECULATIVE_TOOLS, SPECULATION_WINDOW, SPECULATION_WASTE_CAP,
+    RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_TTL, RESPONSE_CACHE_WEB_TTL, RESPONSE_CACHE_MAX_ENTRIES,
+    MODE_DEADLINES, ROUTER_MIN_BUDGET, TOOL_BUDGET_SHARE, MIN_TOOL_BUDGET,
+    GENERATION_TOKENS_PER_SECOND, MODE_MAX_TOKENS, MIN_MAX_TOKENS, STREAM_GRACE_SHARE, FIRST_TOKEN_RTT_MULTIPLE, MODE_PROMPT_BUDGETS,
+    MODEL_CASCADE, CASCADE_ESCALATION_THRESHOLD,
+    MEMORY_TOKEN_BUDGET, MEMORY_VERBATIM_TURNS, MEMORY_SUMMARY_TOKENS, MEMORY_MAX_SESSIONS,
+    LONG_DOC_KEYWORDS, LONG_DOC_MAX_SECTIONS, LONG_DOC_CONCURRENCY, LONG_DOC_SECTION_TOKENS,
+)
+from src.utils.async_bridge import iterate_sync
+from src.utils.http_pool import get_shared_pool
+from src.utils.deadline import Deadline
+from src.utils.single_flight import get_flight
+from src.utils.cancel import CancelToken
+from src.utils.load_governor import get_governor
+from src.utils.usage import get_ledger
+from src.utils.tokens import estimate_tokens, trim_to_tokens
+from collections import OrderedDict, deque
+import asyncio
 import datetime
+import re
+import time
+
+# Modes whose answers are safe to reuse. DEEP_REASONING always thinks fresh.
+CACHEABLE_MODES = ("FAST_RESPONSE", "STANDARD")
+
+# Shown in place of (or after) an answer the latency budget cut short
+NO_ANSWER_NOTICE = "⏱️ No answer arrived within the latency budget. Please try again or pick a slower mode."
+TRUNCATED_NOTICE = "\n\n_⏱️ Answer truncated at the latency budget._"
+
+class ToolChunk:
+    """Mimics a Mistral stream chunk so the UI can consume tool output like model output."""
+    def __init__(self, text):
+        self.data = type('obj', (object,), {
+            'choices': [type('obj', (object,), {
+                'delta': type('obj', (object,), {'content': text})()
+            })()]
+        })()
 
 class AdaptiveAgent:
-    def __init__(self):
-        self.client = Mistral(api_key=MISTRAL_API_KEY)
-        self.sentinel = NetworkSentinel()
-        self.rag = NativeRAG()
+    def __init__(self, pool=None):
+        # Every component shares one connection pool (and one Mistral client)
+        self.pool = pool or get_shared_pool()
+        self.llm = self.pool.llm
+        self.sentinel = get_sentinel(pool=self.pool)
+        self.rag = NativeRAG(pool=self.pool)
         self.docs = DocumentTool()
-        self.web = WebSearchTool() 
+        self.web = WebSearchTool(pool=self.pool) 
+        self.router = IntentClassifier()
+        self.cache = ResponseCache(threshold=RESPONSE_CACHE_THRESHOLD, max_entries=RESPONSE_CACHE_MAX_ENTRIES)
         self.has_context = False
+        self.cascade = MODEL_CASCADE
+        self.cascade_stats = CascadeStats()
+        self.governor = get_governor()
+        # Per-mode history of speculative launches: True = used, False = wasted
+        self.speculation_log = {m: deque(maxlen=SPECULATION_WINDOW) for m in SPECULATION_WASTE_CAP}
+        # One bounded ConversationMemory per session id, least recently used evicted first
+        self.memories = OrderedDict()
+        # CancelToken of the request each session is currently waiting on
+        self.active = {}
 
     def upload_document(self, file_path):
         """Standard RAG ingestion logic."""
         self.rag.ingest_pdf(file_path)
         self.has_context = True
     
-    def execute_stream(self, user_query, override_mode="Auto (Network)"):
+    def execute_stream(self, user_query, override_mode="Auto (Network)", session_id="default", trace=None, cancel=None):
+        """
+        Synchronous entry point (Streamlit). A thin wrapper that drives
+        execute_stream_async on the shared background event loop.
+        """
+        return iterate_sync(self.execute_stream_async(user_query, override_mode, session_id, trace, cancel))
+
+    async def execute_stream_async(self, user_query, override_mode="Auto (Network)", session_id="default",
+                                   trace=None, cancel=None):
         """
-        THE COMPETITION CORE:
+        Answers `user_query` in the context of its conversation.
+        `session_id` selects the conversation memory; None answers statelessly.
+        The finished exchange is recorded once the stream completes.
+        Pass a dict as `trace` to get the chosen mode/intent, per-stage timings (ms)
+        and the request's token usage and cost back.
+        The request stops as soon as `cancel` (a CancelToken) fires, or when a
+        newer request arrives for the same session.
+        """
+        started = time.monotonic()
+        cancel = cancel or CancelToken()
+        usage = get_ledger().start_request(session_id)
+        if session_id is not None:
+            previous = self.active.get(session_id)
+            if previous:
+                previous.cancel("superseded by a newer message")
+            self.active[session_id] = cancel
+
+        # Admission control: past the hard limit, wait briefly for a slot or shed
+        waited = await self.governor.admit()
+        if trace is not None:
+            trace["admission_ms"] = self._ms_since(started)
+        if waited is None:
+            if self.active.get(session_id) is cancel:
+                del self.active[session_id]
+            if trace is not None:
+                trace["shed"] = True
+            yield ToolChunk("⚠️ The agent is at capacity right now. Please try again in a few seconds.")
+            return
+
+        memory = self._memory_for(session_id)
+        history = memory.render() if memory else ""
+
+        parts = []
+        try:
+            pipeline = self._answer_stream(user_query, override_mode, history, session_id, trace, cancel, usage)
+            async for chunk in cancel.guard(pipeline):
+                content = chunk.data.choices[0].delta.content
+                if content and not content.startswith("[[PROGRESS:"):
+                    if not parts and trace is not None:
+                        trace["first_token_ms"] = self._ms_since(started)
+                    parts.append(content)
+                yield chunk
+        finally:
+            self.governor.release()
+            if self.active.get(session_id) is cancel:
+                del self.active[session_id]
+
+        if trace is not None:
+            trace["total_ms"] = self._ms_since(started)
+            trace["cancelled"] = cancel.reason
+            trace["usage"] = usage.as_dict()
+
+        # A cancelled answer is a fragment; do not build on it
+        if memory and parts and not cancel.cancelled:
+            memory.add_turn(user_query, "".join(parts))
+
+    def cancel(self, session_id="default", reason="cancelled by user"):
+        """Stops the session's in-flight request. Safe to call from any thread."""
+        token = self.active.get(session_id)
+        if token:
+            token.cancel(reason)
+
+    def reset_memory(self, session_id="default"):
+        memory = self.memories.pop(session_id, None)
+        if memory:
+            memory.clear()
+
+    def _memory_for(self, session_id):
+        if session_id is None:
+            return None
+        if session_id not in self.memories:
+            self.memories[session_id] = ConversationMemory(
+                self.llm, MEMORY_TOKEN_BUDGET, MEMORY_VERBATIM_TURNS, MEMORY_SUMMARY_TOKENS
+            )
+            while len(self.memories) > MEMORY_MAX_SESSIONS:
+                self.memories.popitem(last=False)[1].clear()
+        self.memories.move_to_end(session_id)
+        return self.memories[session_id]
+
+    async def _answer_stream(self, user_query, override_mode, history, session=None, trace=None, cancel=None,
+                             usage=None):
+        """
+        THE COMPETITION CORE (async iterator of chunks):
         1. Checks User Override vs Network Sentinel.
         2. Detects Intent (Cognitive Routing).
         3. Throttles Tools (Social Intelligence).
         4. Adjusts Reasoning Framework.
+        Every stage runs against the mode's end-to-end Deadline.
         """
+        started = time.monotonic()
+        stage_started = started
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # --- 1. Mode Selection Logic ---
@@ -39,8 +185,23 @@ class AdaptiveAgent:
         elif "Fast Response" in override_mode:
             mode = "FAST_RESPONSE"
         else:
-            # Default to Network Sentinel
+            # Default to Network Sentinel (its cached verdict; probing happens in the background)
             mode = self.sentinel.get_mode()
+
+        # Our own load can only make the mode cheaper, never richer
+        mode = self.governor.adjust(mode)
+
+        def mark(stage, **facts):
+            """Records how long the stage that just ended took, plus what it decided."""
+            nonlocal stage_started
+            if trace is not None:
+                trace[f"{stage}_ms"] = self._ms_since(stage_started)
+                trace.update(facts)
+            stage_started = time.monotonic()
+
+        if usage is not None:
+            usage.mode = mode
+        mark("mode", mode=mode, load_level=self.governor.level)
         
         # --- 2. Cognitive Intent Routing ---
         greetings = ["hello", "hi", "hey", "assalam", "yo", "greeting"]
@@ -48,28 +209,25 @@ class AdaptiveAgent:
 
         print(f"[AGENT] Social: {is_social} | Selected Mode: {mode} (User: {override_mode})")
 
+        # The clock started with the request, so admission and mode selection count against the budget
+        deadline = Deadline(MODE_DEADLINES["STANDARD" if is_social else mode], start=started)
+        print(f"[DEADLINE] {deadline}")
+
         intent_response = "NONE"
+        speculative = {}
         if not is_social:
-            router_prompt = f"""
-            You are an intent classification system.
-            Classify the QUERY into exactly ONE category:
-
-            WEB  -> Real-time info (news, weather, stocks).
-            RAG  -> Private documents/knowledge base.
-            DOC  -> Request to create/generate/download a file (PDF, Excel, Word).
-            NONE -> General knowledge.
-
-            STRICT RULES: Output ONLY one word: WEB, RAG, DOC, or NONE.
-
-            QUERY: {user_query}
-            """
-
-            intent_response = self.client.chat.complete(
-                model="mistral-small-latest",
-                messages=[{"role": "user", "content": router_prompt}]
-            ).choices[0].message.content.upper()
+            routed = False
+            try:
+                intent_response = await self._route_intent(user_query, mode, speculative, deadline, session, usage)
+                routed = True
+            finally:
+                # Cancelled or failed: nothing will ever collect the speculative tools
+                if not routed:
+                    for future in speculative.values():
+                        future.cancel()
 
         print(f"[ROUTER] Intent Detected: {intent_response}")
+        mark("route", intent=intent_response.strip())
 
         context_block = ""
         
@@ -81,33 +239,387 @@ class AdaptiveAgent:
         model = "mistral-large-latest" if effective_mode == "DEEP_REASONING" else "mistral-small-latest"
         print(f"[AGENT] Effective Mode: {effective_mode} | Model: {model}")
 
-        # --- 4. Strategic Tool Execution ---
+        # --- 4. Strategic Tool Execution (Parallel Fan-out) ---
+        tools = {}
         if not is_social:
-            if "WEB" in intent_response or any(w in user_query.lower() for w in ["now", "today", "weather"]):
-                web_data = self.web.search(user_query, mode=effective_mode)
-                context_block += f"\n[LATEST WEB DATA]:\n{web_data}\n"
-            
-            if "RAG" in intent_response or self.has_context:
-                retrieved_text = self.rag.retrieve(user_query)
-                context_block += f"\n[DOCUMENT CONTEXT]:\n{retrieved_text}\n"
-            
             if "DOC" in intent_response:
-                return self._handle_doc_tool(user_query)
+                # Documents are long by nature; they are exempt from the chat deadline
+                self._settle_speculation(speculative, {}, mode)
+                async for chunk in self._handle_doc_tool(user_query, session, cancel, usage):
+                    yield chunk
+                mark("document")
+                return
+
+            needed = []
+            if "WEB" in intent_response or self._is_time_sensitive(user_query):
+                needed.append("WEB")
+            if "RAG" in intent_response or self.has_context:
+                needed.append("RAG")
+
+            if needed and deadline.remaining() * TOOL_BUDGET_SHARE < MIN_TOOL_BUDGET and not speculative:
+                print(f"[DEADLINE] Skipping tools {needed}: only {deadline.remaining():.2f}s left.")
+                needed = []
+
+            # Reuse anything already started speculatively, launch the rest now
+            tools = {name: speculative.get(name) or self._start_tool(name, user_query, effective_mode, deadline, session, usage)
+                     for name in needed}
+            self._settle_speculation(speculative, tools, mode)
+
+        # The cache key needs the query embedding; fetch it alongside the tools
+        if effective_mode in CACHEABLE_MODES:
+            tools["EMBED"] = asyncio.create_task(
+                self.rag.embed_query_async(user_query, priority=effective_mode, session=session, usage=usage)
+            )
 
-        # Framing the 'How' vs 'What'
-        prompt = self._get_adaptive_prompt(effective_mode, user_query, context_block, now)
+        results = await self._collect_tools(tools, deadline)
+        mark("tools", effective_mode=effective_mode, tools=[name for name in tools if name in results])
+        if results.get("WEB"):
+            context_block += f"\n[LATEST WEB DATA]:\n{results['WEB']}\n"
+        if results.get("RAG"):
+            context_block += f"\n[DOCUMENT CONTEXT]:\n{results['RAG']}\n"
+
+        # Framing the 'How' vs 'What' (kept within the mode's prompt budget)
+        context_block, history = self._fit_prompt_budget(effective_mode, user_query, context_block, now, history)
+        prompt = self._get_adaptive_prompt(effective_mode, user_query, context_block, now, history)
         
         # --- 5. Tool-Specific Fallbacks ---
         if "save" in user_query.lower() and ("pdf" in user_query.lower() or "excel" in user_query.lower() or "word" in user_query.lower()):
-            return self._handle_doc_tool(user_query)
-
-        # --- 6. Return Generator ---
-        return self.client.chat.stream(
+            async for chunk in self._handle_doc_tool(user_query, session, cancel, usage):
+                yield chunk
+            mark("document")
+            return
+
+        # --- 6. Semantic Response Cache ---
+        query_vector = results.get("EMBED")
+        if query_vector is not None:
+            # The same words mean something else after a different conversation
+            ctx = context_hash(context_block + history)
+            cached, similarity = self.cache.lookup(query_vector, effective_mode, ctx)
+            mark("cache", cache_hit=cached is not None)
+            if cached is not None:
+                print(f"[CACHE] ⚡ Hit (similarity {similarity:.3f}). Replaying cached answer.")
+                async for chunk in self._replay(cached):
+                    yield chunk
+                return
+
+        # --- 7. Model Cascade (small draft first, large model only when needed) ---
+        escalated = None
+        if self.cascade and model == "mistral-large-latest":
+            draft_started = time.monotonic()
+            draft = await self._cascade_draft(prompt, context_block, deadline, session, usage)
+            small_seconds = time.monotonic() - draft_started
+            mark("cascade", draft_kept=draft is not None)
+            if draft is not None:
+                self.cascade_stats.record(False, small_seconds)
+                print(f"[CASCADE] ✅ Small-model draft kept | {self.cascade_stats.summary()}")
+                async for chunk in self._replay(draft):
+                    yield chunk
+                return
+            escalated = (small_seconds, time.monotonic())
+            print("[CASCADE] ⬆️ No usable draft. Escalating to mistral-large-latest.")
+
+        # --- 8. Stream the Answer (sized to fit what is left of the deadline) ---
+        max_tokens = int(deadline.remaining() * GENERATION_TOKENS_PER_SECOND)
+        max_tokens = max(MIN_MAX_TOKENS, min(MODE_MAX_TOKENS[effective_mode], max_tokens))
+        print(f"[DEADLINE] {deadline.remaining():.2f}s left for generation -> max_tokens={max_tokens}")
+
+        # Identical question, mode and evidence from several sessions: one upstream stream, fanned out
+        flight_key = (normalize_query(user_query), effective_mode, model, context_hash(context_block + history))
+        stream = self._bounded(get_flight("generation").stream(flight_key, lambda: self.llm.stream(
             model=model,
-            messages=[{"role": "user", "content": prompt}]
-        )
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            priority=effective_mode,
+            session=session,
+            cancel=cancel,
+            kind="generation",
+            usage=usage
+        )), deadline)
+        if trace is not None:
+            trace.update(model=model, max_tokens=max_tokens)
+        if query_vector is None:
+            answer = stream
+        else:
+            ttl = RESPONSE_CACHE_WEB_TTL if "WEB" in tools else RESPONSE_CACHE_TTL
+            answer = self._stream_and_cache(stream, query_vector, effective_mode, ctx, ttl, deadline)
+        try:
+            async for chunk in answer:
+                yield chunk
+        finally:
+            # Closed here, not left to garbage collection: on cancel the upstream
+            # stream must be torn down (and its usage booked) before the trace is taken
+            await answer.aclose()
+            await stream.aclose()
+        if escalated:
+            self.cascade_stats.record(True, escalated[0], time.monotonic() - escalated[1])
+            print(f"[CASCADE] {self.cascade_stats.summary()}")
+        mark("generation", deadline_missed=deadline.missed)
+
+    async def _route_intent(self, user_query, mode, speculative, deadline, session=None, usage=None):
+        """
+        Local classifier first (microseconds). The LLM router is only paid for
+        when the classifier is unsure, and every verdict is memoized per
+        normalized query. While the LLM router is in flight, likely tools are
+        started speculatively into `speculative` to hide its latency.
+        """
+        start = time.perf_counter()
+        intent, confidence = self.router.classify(user_query)
+        elapsed_us = int((time.perf_counter() - start) * 1_000_000)
+
+        if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            print(f"[ROUTER] Local verdict: {intent} (confidence {confidence:.2f}, {elapsed_us}us)")
+            self.router.remember(user_query, intent)
+            return intent
+
+        if not deadline.allows(ROUTER_MIN_BUDGET):
+            print(f"[DEADLINE] No budget for the LLM router. Going with local verdict: {intent}")
+            return intent
+
+        print(f"[ROUTER] Local verdict unsure ({intent}, {confidence:.2f}). Asking LLM router...")
+        speculative.update(self._speculate(user_query, mode, deadline, session, usage))
+        router_prompt = f"""
+            You are an intent classification system.
+            Classify the QUERY into exactly ONE category:
+
+            WEB  -> Real-time info (news, weather, stocks).
+            RAG  -> Private documents/knowledge base.
+            DOC  -> Request to create/generate/download a file (PDF, Excel, Word).
+            NONE -> General knowledge.
+
+            STRICT RULES: Output ONLY one word: WEB, RAG, DOC, or NONE.
 
-    def _get_adaptive_prompt(self, mode, query, context, time):
+            QUERY: {user_query}
+            """
+
+        # Sessions asking the same thing at once share one router call
+        def router_call():
+            return self.llm.complete(
+                model="mistral-small-latest",
+                messages=[{"role": "user", "content": router_prompt}],
+                priority=mode,
+                session=session,
+                kind="router",
+                usage=usage
+            )
+
+        try:
+            response = await asyncio.wait_for(
+                get_flight("router").do((normalize_query(user_query), mode), router_call),
+                timeout=deadline.cap(10.0, share=0.5)
+            )
+        except asyncio.TimeoutError:
+            print(f"[DEADLINE] LLM router too slow. Going with local verdict: {intent}")
+            return intent
+        except Exception as e:
+            # Routing is an optimization; a failed router must not fail the request
+            print(f"[ROUTER] ⚠️ LLM router failed ({e}). Going with local verdict: {intent}")
+            return intent
+        intent = response.choices[0].message.content.upper()
+
+        self.router.remember(user_query, intent)
+        return intent
+
+    def _fit_prompt_budget(self, mode, query, context_block, now, history):
+        """
+        Trims the prompt's inputs until it fits MODE_PROMPT_BUDGETS[mode]:
+        retrieved context first (the tail is the least relevant), then the
+        oldest conversation history.
+        """
+        budget = MODE_PROMPT_BUDGETS[mode]
+        excess = estimate_tokens(self._get_adaptive_prompt(mode, query, context_block, now, history)) - budget
+        if excess <= 0:
+            return context_block, history
+
+        before = excess + budget
+        if context_block:
+            keep = max(0, estimate_tokens(context_block) - excess)
+            excess -= estimate_tokens(context_block) - keep
+            context_block = trim_to_tokens(context_block, keep) if keep else ""
+        if excess > 0 and history:
+            keep = max(0, estimate_tokens(history) - excess)
+            # History renders oldest first; keep its end
+            history = trim_to_tokens(history, keep, keep_end=True) if keep else ""
+
+        after = estimate_tokens(self._get_adaptive_prompt(mode, query, context_block, now, history))
+        print(f"[BUDGET] ✂️ Prompt trimmed from ~{before} to ~{after} tokens ({mode} budget {budget}).")
+        return context_block, history
+
+    def _ms_since(self, start):
+        return round((time.monotonic() - start) * 1000, 1)
+
+    def _is_time_sensitive(self, user_query):
+        return any(w in user_query.lower() for w in ["now", "today", "weather"])
+
+    def _start_tool(self, name, user_query, mode, deadline, session=None, usage=None):
+        """Starts a tool with a depth the remaining budget can afford."""
+        if name == "WEB":
+            # A shallow search answers noticeably faster than a deep one
+            max_results = 3 if not deadline.allows(2.0) else None
+            return asyncio.create_task(self.web.search_async(user_query, mode=mode, max_results=max_results))
+
+        # More chunks = longer prompt = slower generation
+        top_k = 5 if deadline.allows(8.0) else 3 if deadline.allows(1.5) else 2
+        return asyncio.create_task(self.rag.retrieve_async(user_query, top_k=top_k, priority=mode,
+                                                         session=session, usage=usage))
+
+    def _speculate(self, user_query, mode, deadline, session=None, usage=None):
+        """
+        Starts the tools the final intent will most likely need:
+        RAG when a document is loaded, WEB when the query is time-sensitive.
+        A mode that keeps wasting its speculation stops speculating until its
+        window of recent launches clears up.
+        """
+        if not SPECULATIVE_TOOLS:
+            return {}
+
+        history = self.speculation_log[mode]
+        wasted = history.count(False)
+        if wasted >= SPECULATION_WASTE_CAP[mode]:
+            print(f"[SPECULATE] Paused for {mode}: {wasted}/{len(history)} recent launches wasted.")
+            # Paused requests count as neutral, so old waste ages out of the window and speculation resumes
+            history.append(None)
+            return {}
+
+        candidates = []
+        if self.has_context:
+            candidates.append("RAG")
+        if self._is_time_sensitive(user_query):
+            candidates.append("WEB")
+
+        if candidates:
+            print(f"[SPECULATE] Starting {candidates} while the router decides.")
+        return {name: self._start_tool(name, user_query, mode, deadline, session, usage) for name in candidates}
+
+    def _settle_speculation(self, speculative, tools, mode):
+        """Records which speculative launches were used and cancels the rest."""
+        for name, future in speculative.items():
+            used = tools.get(name) is future
+            self.speculation_log[mode].append(used)
+            if not used:
+                future.cancel()
+                print(f"[SPECULATE] Discarded {name} (final intent did not need it).")
+
+    async def _collect_tools(self, tools, deadline):
+        """
+        Waits on the running tool futures, each against its own timeout.
+        Total wait is max(web, rag) instead of the sum. A tool that times out
+        or crashes degrades to missing context instead of failing the request.
+        Timeouts shrink to a share of the deadline so generation keeps its slice.
+        """
+        limits = {"WEB": WEB_TOOL_TIMEOUT, "RAG": RAG_TOOL_TIMEOUT, "EMBED": RAG_TOOL_TIMEOUT}
+        timeouts = {name: deadline.cap(limits[name], share=TOOL_BUDGET_SHARE) for name in tools}
+        start = time.monotonic()
+        results = {}
+
+        try:
+            for name, future in tools.items():
+                remaining = max(0.0, timeouts[name] - (time.monotonic() - start))
+                try:
+                    results[name] = await asyncio.wait_for(future, timeout=remaining)
+                except asyncio.TimeoutError:
+                    print(f"[TOOL] ⏱️ {name} timed out after {timeouts[name]:.2f}s. Continuing without it.")
+                except Exception as e:
+                    print(f"[TOOL] ⚠️ {name} failed: {e}. Continuing without it.")
+        finally:
+            # On cancellation, the tools we had not reached yet must not keep running
+            for future in tools.values():
+                future.cancel()
+
+        print(f"[TOOL] Fan-out finished in {int((time.monotonic() - start) * 1000)}ms: {list(results)}")
+        return results
+
+    async def _replay(self, response):
+        """Serves a cached answer through the same chunk interface as a live stream."""
+        yield ToolChunk(response)
+
+    async def _cascade_draft(self, prompt, context_block, deadline, session=None, usage=None):
+        """
+        Asks mistral-small for a complete answer plus a self-rated confidence,
+        scores it (confidence, length, grounding in the context) and returns
+        it if it clears CASCADE_ESCALATION_THRESHOLD, else None.
+        """
+        # The draft may use half the budget; escalation needs the other half
+        max_tokens = int(deadline.remaining() * 0.5 * GENERATION_TOKENS_PER_SECOND)
+        max_tokens = max(MIN_MAX_TOKENS, min(MODE_MAX_TOKENS["DEEP_REASONING"], max_tokens))
+        try:
+            response = await asyncio.wait_for(self.llm.complete(
+                model="mistral-small-latest",
+                messages=[{"role": "user", "content": prompt + CONFIDENCE_INSTRUCTION}],
+                max_tokens=max_tokens,
+                priority="DEEP_REASONING",
+                session=session,
+                kind="cascade",
+                usage=usage
+            ), timeout=deadline.cap(60.0, share=0.5))
+        except asyncio.TimeoutError:
+            print("[CASCADE] Draft timed out.")
+            return None
+        except Exception as e:
+            # The large model can still answer; a failed draft only means escalating
+            print(f"[CASCADE] Draft failed: {e}")
+            return None
+
+        if response.choices[0].finish_reason == "length":
+            print("[CASCADE] Draft cut off by max_tokens.")
+            return None
+
+        answer, confidence = split_confidence(response.choices[0].message.content or "")
+        score = score_answer(answer, confidence, context_block)
+        print(f"[CASCADE] Draft score {score:.2f} (self-confidence {confidence}, {len(answer)} chars)")
+        return answer if score >= CASCADE_ESCALATION_THRESHOLD else None
+
+    async def _bounded(self, stream, deadline):
+        """
+        Passes chunks through until the deadline, then closes the upstream stream.
+        However little the earlier stages left, the first token gets
+        STREAM_GRACE_SHARE of the mode's budget (at least FIRST_TOKEN_RTT_MULTIPLE
+        measured round trips), and the answer as much again after it, so an
+        overrun stays proportional to the mode. A cut stream says so.
+        """
+        grace = deadline.budget * STREAM_GRACE_SHARE
+        rtt = (self.sentinel.latency() or 0) / 1000
+        first_token_window = max(grace, FIRST_TOKEN_RTT_MULTIPLE * rtt)
+        tail_expires = None  # Set at the first token
+        try:
+            while True:
+                if tail_expires is None:
+                    timeout = max(deadline.remaining(), first_token_window)
+                else:
+                    timeout = max(0.0, tail_expires - time.monotonic())
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    deadline.missed = True
+                    if tail_expires is None:
+                        print(f"[DEADLINE] ⏱️ No first token within {timeout:.1f}s. Giving up on the stream.")
+                        yield ToolChunk(NO_ANSWER_NOTICE)
+                    else:
+                        print(f"[DEADLINE] ⏱️ Budget of {deadline.budget}s spent. Cutting the stream.")
+                        yield ToolChunk(TRUNCATED_NOTICE)
+                    return
+
+                choices = chunk.data.choices
+                if tail_expires is None and choices and choices[0].delta.content:
+                    tail_expires = max(deadline.expires, time.monotonic() + grace)
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _stream_and_cache(self, stream, query_vector, mode, ctx, ttl, deadline):
+        """Passes the live stream through untouched and caches the answer once it completes."""
+        parts = []
+        async for chunk in stream:
+            if chunk.data.choices[0].delta.content:
+                parts.append(chunk.data.choices[0].delta.content)
+            yield chunk
+
+        # A stream cut by the deadline is a partial answer; never cache it
+        if parts and not deadline.missed:
+            self.cache.store(query_vector, mode, ctx, "".join(parts), ttl)
+
+    def _get_adaptive_prompt(self, mode, query, context, time, history=""):
         """
         MASTER-LEVEL ADAPTIVE REASONING CONTROLLER
         Controls reasoning depth while enforcing strict grounding hierarchy.
@@ -122,8 +634,10 @@ class AdaptiveAgent:
     3. If context conflicts with prior knowledge, trust context.
     4. If insufficient data, explicitly state uncertainty.
     5. Do NOT fabricate missing details.
+    6. Use CONVERSATION_HISTORY only to resolve references in USER_QUERY (it, that, the same...).
     
     INPUTS:
+    - CONVERSATION_HISTORY: {history if history else "None"}
     - AVAILABLE_CONTEXT: {context if context else "None"}
     - USER_QUERY: {query}
     """
@@ -236,7 +750,7 @@ class AdaptiveAgent:
     # """
     #     return f"{grounding}\n{framework}"
 
-    def _handle_doc_tool(self, query):
+    async def _handle_doc_tool(self, query, session=None, cancel=None, usage=None):
         """
         Smartly generates PDF, WORD, or EXCEL based on user query keywords.
         """
@@ -271,31 +785,145 @@ class AdaptiveAgent:
 
         print(f"[TOOL] 📄 Generating {file_type} content for: {query}")
         
-        # 2. Generate Content
-        content = self.client.chat.complete(
+        writer = self.docs.open_writer(file_type)
+        unit = "rows" if file_type == "EXCEL" else "sections"
+
+        # 2a. Long reports: outline first, then sections in parallel
+        if file_type != "EXCEL" and any(k in query_lower for k in LONG_DOC_KEYWORDS):
+            async for chunk in self._write_long_document(query, file_type, writer, session, cancel, usage):
+                yield chunk
+            path = await asyncio.to_thread(writer.finish)
+            yield ToolChunk(f"I have generated your {file_type} document.\n\n[[DOWNLOAD:{path}]]")
+            return
+
+        # 2b. Stream Content straight into the file, line by line
+        # Long-running bulk work: queued behind interactive answers when the model is saturated
+        stream = self.llm.stream(
             model="mistral-large-latest",
-            messages=[{"role": "user", "content": prompt_instruction + query}]
-        ).choices[0].message.content
-        
-        # 3. Create the physical file
-        if file_type == "EXCEL":
-            path = self.docs.create_excel(content)
-        elif file_type == "WORD":
-            path = self.docs.create_word(content)
-        else:
-            path = self.docs.create_pdf(content)
+            messages=[{"role": "user", "content": prompt_instruction + query}],
+            priority="DEEP_REASONING",
+            session=session,
+            cancel=cancel,
+            kind="document",
+            usage=usage
+        )
+
+        buffer = ""
+        reported = (0, 0)
+        async for chunk in stream:
+            delta = chunk.data.choices[0].delta.content
+            if not delta:
+                continue
+            buffer += delta
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                writer.write_line(line)
+
+            # Progress on every new section, or every ~2KB inside a long one
+            if writer.sections > reported[0] or writer.bytes_written - reported[1] >= 2048:
+                reported = (writer.sections, writer.bytes_written)
+                yield ToolChunk(f"[[PROGRESS:Writing {file_type}... {writer.sections} {unit}, {writer.bytes_written / 1024:.1f} KB]]")
+
+        if buffer:
+            writer.write_line(buffer)
+
+        # 3. Finalize the physical file (disk write stays off the event loop)
+        path = await asyncio.to_thread(writer.finish)
         
         # 4. Yield the response with the HIDDEN TAG [[DOWNLOAD:path]]
-        class ToolChunk:
-            def __init__(self, text):
-                self.data = type('obj', (object,), {
-                    'choices': [type('obj', (object,), {
-                        'delta': type('obj', (object,), {'content': text})()
-                    })()]
-                })()
-
         yield ToolChunk(f"I have generated your {file_type} document.\n\n[[DOWNLOAD:{path}]]")
 
+    async def _write_long_document(self, query, file_type, writer, session=None, cancel=None, usage=None):
+        """
+        Long-document mode. One call drafts an outline. Then every section is
+        generated concurrently (at most LONG_DOC_CONCURRENCY at once), each
+        seeing the whole outline for coherence. Sections are written to
+        `writer` strictly in outline order as soon as each one and all
+        before it are done, so wall-clock time approaches that of the
+        slowest section instead of the sum of all of them.
+        """
+        title, headings = await self._draft_outline(query, session, usage)
+        print(f"[TOOL] 🗂️ Outline ready: {len(headings)} sections for '{title}'.")
+        yield ToolChunk(f"[[PROGRESS:Outline ready: {len(headings)} sections. Writing them in parallel...]]")
+
+        outline = "\n".join(f"{i + 1}. {h}" for i, h in enumerate(headings))
+        slots = asyncio.Semaphore(LONG_DOC_CONCURRENCY)
+
+        async def write_section(heading):
+            async with slots:
+                prompt = (
+                    f"You are writing one section of a {file_type} report titled '{title}'.\n"
+                    f"Full outline (for context only):\n{outline}\n\n"
+                    f"Write ONLY the body of the section '{heading}'.\n"
+                    "- Do NOT repeat the heading and do NOT use '# ' or '## ' lines.\n"
+                    "- Use plain paragraphs and '* ' for bullet points.\n"
+                    "- Do NOT use bolding symbols like ** inside the text.\n"
+                    f"The report is about: {query}"
+                )
+                parts = []
+                async for chunk in self.llm.stream(
+                    model="mistral-large-latest",
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=LONG_DOC_SECTION_TOKENS,
+                    priority="DEEP_REASONING",
+                    session=session,
+                    cancel=cancel,
+                    kind="section",
+                    usage=usage
+                ):
+                    parts.append(chunk.data.choices[0].delta.content or "")
+                return "".join(parts)
+
+        tasks = [asyncio.create_task(write_section(h)) for h in headings]
+        started = time.monotonic()
+        try:
+            writer.write_line(f"# {title}")
+            for index, (heading, task) in enumerate(zip(headings, tasks)):
+                # Later sections keep generating while we wait for this one
+                try:
+                    body = await task
+                except Exception as e:
+                    print(f"[TOOL] ⚠️ Section '{heading}' failed: {e}")
+                    body = "This section could not be generated."
+
+                writer.write_line(f"## {heading}")
+                for line in body.splitlines():
+                    # A stray heading inside a body would break the outline's order
+                    writer.write_line(re.sub(r"^#+\s*", "", line))
+
+                drafted = sum(t.done() for t in tasks)
+                yield ToolChunk(f"[[PROGRESS:Writing {file_type}... {index + 1}/{len(headings)} sections written, "
+                                f"{drafted} drafted, {writer.bytes_written / 1024:.1f} KB]]")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        print(f"[TOOL] ✅ {len(headings)} sections in {time.monotonic() - started:.1f}s (concurrency {LONG_DOC_CONCURRENCY}).")
+
+    async def _draft_outline(self, query, session=None, usage=None):
+        """Returns (title, [section headings]) for a long document."""
+        prompt = (
+            "You are planning a long report. Output ONLY its outline:\n"
+            "- First line: '# ' followed by the report title.\n"
+            f"- Then one line per section: '## ' followed by the section heading (at most {LONG_DOC_MAX_SECTIONS}).\n"
+            "No other text.\n"
+            f"The report is about: {query}"
+        )
+        response = await self.llm.complete(
+            model="mistral-large-latest",
+            messages=[{"role": "user", "content": prompt}],
+            priority="DEEP_REASONING",
+            session=session,
+            kind="outline",
+            usage=usage
+        )
+        lines = [l.strip() for l in (response.choices[0].message.content or "").splitlines() if l.strip()]
+
+        title = next((l[2:].strip() for l in lines if l.startswith("# ")), query.strip())
+        headings = [l.lstrip("#").strip() for l in lines if l.startswith("##")]
+        headings = [h for h in headings if h][:LONG_DOC_MAX_SECTIONS]
+        return title, headings or ["Overview"]
+
 # from mistralai import Mistral
 # from src.utils.network import NetworkSentinel
 # from src.tools.native_rag import NativeRAG
@@ -0,0 +1,65 @@
+import time
+import hashlib
+import threading
+import numpy as np
+
+
+def context_hash(context_block):
+    """Stable fingerprint of the retrieved context, so answers are only reused over the same evidence."""
+    return hashlib.sha1(context_block.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Semantic answer cache.
+    Key: (query embedding neighbourhood, effective mode, context hash).
+    A lookup hits when an unexpired entry with the same mode and context hash
+    has cosine similarity >= threshold with the new query embedding, so
+    paraphrases of a question reuse the earlier answer.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=512):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries = []  # [{"vector", "mode", "context", "response", "expires"}], oldest first
+        self.lock = threading.Lock()
+
+    def _normalize(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, mode, ctx_hash):
+        """Returns (response, similarity) of the closest live entry, or (None, best_similarity)."""
+        query = self._normalize(vector)
+        now = time.time()
+
+        with self.lock:
+            self.entries = [e for e in self.entries if e["expires"] > now]
+            candidates = [e for e in self.entries if e["mode"] == mode and e["context"] == ctx_hash]
+            if not candidates:
+                return None, 0.0
+
+            similarities = np.stack([e["vector"] for e in candidates]) @ query
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                return None, float(similarities[best])
+
+            # LRU: a hit moves the entry to the back
+            entry = candidates[best]
+            # By identity: dict equality would compare the numpy vectors element-wise
+            self.entries = [e for e in self.entries if e is not entry]
+            self.entries.append(entry)
+            return entry["response"], float(similarities[best])
+
+    def store(self, vector, mode, ctx_hash, response, ttl):
+        with self.lock:
+            self.entries.append({
+                "vector": self._normalize(vector),
+                "mode": mode,
+                "context": ctx_hash,
+                "response": response,
+                "expires": time.time() + ttl,
+            })
+            if len(self.entries) > self.max_entries:
+                self.entries = self.entries[-self.max_entries:]
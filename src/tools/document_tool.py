@@ -33,112 +33,170 @@ class DocumentTool:
         # Final fallback: force into latin-1, replacing unknown chars with '?'
         return text.encode('latin-1', 'replace').decode('latin-1')
 
+    def open_writer(self, file_type, filename=None):
+        """
+        Incremental writer for streamed generation: feed it one line at a time
+        with write_line() while the LLM is still talking, then finish() to
+        save the file and get its path.
+        """
+        if file_type == "EXCEL":
+            return ExcelWriter(filename)
+        if file_type == "WORD":
+            return WordWriter(filename)
+        return PdfWriter(self._sanitize_text, filename)
+
     def create_pdf(self, content, filename=None):
         """Generates a PDF with robust encoding handling."""
-        if not filename:
-            filename = f"doc_{uuid.uuid4().hex[:8]}.pdf"
+        return self._write_all("PDF", content, filename)
+
+    def create_word(self, content, filename=None):
+        """Generates a Microsoft Word (.docx) file."""
+        return self._write_all("WORD", content, filename)
+
+    def create_excel(self, content, filename=None):
+        """Generates an Excel (.xlsx) file."""
+        return self._write_all("EXCEL", content, filename)
+
+    def _write_all(self, file_type, content, filename):
+        writer = self.open_writer(file_type, filename)
+        for line in content.split('\n'):
+            writer.write_line(line)
+        return writer.finish()
+
+
+class PdfWriter:
+    """Renders markdown-ish lines onto an FPDF page as they arrive."""
+
+    def __init__(self, sanitize, filename=None):
+        self.filename = filename or f"doc_{uuid.uuid4().hex[:8]}.pdf"
+        self.sanitize = sanitize
+        self.sections = 0      # '#' / '##' headings written so far
+        self.bytes_written = 0 # Raw content bytes consumed so far
+
+        self.pdf = FPDF()
+        self.pdf.add_page()
+        self.pdf.set_auto_page_break(auto=True, margin=15)
+        self.pdf.set_font("Arial", size=11)
+
+    def write_line(self, line):
+        self.bytes_written += len(line.encode('utf-8')) + 1
+        pdf = self.pdf
+
+        # 1. SANITIZE EVERY LINE FIRST
+        line = self.sanitize(line).strip()
+        if not line:
+            pdf.ln(3)
+            return
+
+        try:
+            # CASE 1: Main Title (#)
+            if line.startswith('# '):
+                self.sections += 1
+                pdf.set_font("Arial", 'B', 16)
+                pdf.multi_cell(0, 10, line.replace('# ', '').strip())
+                pdf.ln(2)
+
+            # CASE 2: Section Heading (## or ###)
+            elif line.startswith('##') or line.startswith('###'):
+                self.sections += 1
+                pdf.set_font("Arial", 'B', 12)
+                clean_text = line.replace('### ', '').replace('## ', '').strip()
+                pdf.multi_cell(0, 8, clean_text)
+                pdf.ln(1)
             
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.set_font("Arial", size=11)
-        
-        # 1. SANITIZE EVERYTHING FIRST
-        content = self._sanitize_text(content)
-        
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                pdf.ln(3)
-                continue
-
-            try:
-                # CASE 1: Main Title (#)
-                if line.startswith('# '):
-                    pdf.set_font("Arial", 'B', 16)
-                    pdf.multi_cell(0, 10, line.replace('# ', '').strip())
-                    pdf.ln(2)
-
-                # CASE 2: Section Heading (## or ###)
-                elif line.startswith('##') or line.startswith('###'):
-                    pdf.set_font("Arial", 'B', 12)
-                    clean_text = line.replace('### ', '').replace('## ', '').strip()
-                    pdf.multi_cell(0, 8, clean_text)
-                    pdf.ln(1)
-                
-                # CASE 3: Bullet Points (* or -)
-                elif line.startswith('* ') or line.startswith('- '):
-                    pdf.set_font("Arial", '', 11)
-                    clean_text = line[2:].strip()
-                    current_x = pdf.get_x()
-                    pdf.set_x(current_x + 5) 
-                    pdf.multi_cell(0, 6, f"{chr(149)} {clean_text}")
-                    pdf.set_x(current_x)
-
-                # CASE 4: Standard Text
-                else:
-                    pdf.set_font("Arial", '', 11)
-                    pdf.multi_cell(0, 6, line)
-                    
-            except Exception as e:
-                print(f"[PDF ERROR] Line skipped: {e}")
-                # Emergency fallback
+            # CASE 3: Bullet Points (* or -)
+            elif line.startswith('* ') or line.startswith('- '):
+                pdf.set_font("Arial", '', 11)
+                clean_text = line[2:].strip()
+                current_x = pdf.get_x()
+                pdf.set_x(current_x + 5) 
+                pdf.multi_cell(0, 6, f"{chr(149)} {clean_text}")
+                pdf.set_x(current_x)
+
+            # CASE 4: Standard Text
+            else:
                 pdf.set_font("Arial", '', 11)
                 pdf.multi_cell(0, 6, line)
+                
+        except Exception as e:
+            print(f"[PDF ERROR] Line skipped: {e}")
+            # Emergency fallback
+            pdf.set_font("Arial", '', 11)
+            pdf.multi_cell(0, 6, line)
 
-        path = f"data/{filename}"
+    def finish(self):
+        path = f"data/{self.filename}"
         try:
-            pdf.output(path)
+            self.pdf.output(path)
             return path
         except Exception as e:
             print(f"[CRITICAL PDF FAILURE] {e}")
             return "Error_Generating_PDF.pdf"
 
-    def create_word(self, content, filename=None):
-        """Generates a Microsoft Word (.docx) file."""
-        if not filename:
-            filename = f"doc_{uuid.uuid4().hex[:8]}.docx"
-        
-        if Document is None:
+
+class WordWriter:
+    """Appends headings, bullets and paragraphs to a .docx as lines arrive."""
+
+    def __init__(self, filename=None):
+        self.filename = filename or f"doc_{uuid.uuid4().hex[:8]}.docx"
+        self.sections = 0
+        self.bytes_written = 0
+        self.doc = Document() if Document is not None else None
+
+    def write_line(self, line):
+        self.bytes_written += len(line.encode('utf-8')) + 1
+        line = line.strip()
+        if not line or self.doc is None: return
+
+        if line.startswith('# '):
+            self.sections += 1
+            self.doc.add_heading(line.replace('# ', '').strip(), level=1)
+        elif line.startswith('## '):
+            self.sections += 1
+            self.doc.add_heading(line.replace('## ', '').replace('### ', '').strip(), level=2)
+        elif line.startswith('* ') or line.startswith('- '):
+            self.doc.add_paragraph(line[2:].strip(), style='List Bullet')
+        else:
+            self.doc.add_paragraph(line)
+
+    def finish(self):
+        if self.doc is None:
             return "Error: python-docx not installed"
 
-        doc = Document()
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-            
-            if line.startswith('# '):
-                doc.add_heading(line.replace('# ', '').strip(), level=1)
-            elif line.startswith('## '):
-                doc.add_heading(line.replace('## ', '').replace('### ', '').strip(), level=2)
-            elif line.startswith('* ') or line.startswith('- '):
-                doc.add_paragraph(line[2:].strip(), style='List Bullet')
-            else:
-                doc.add_paragraph(line)
-                
-        path = f"data/{filename}"
-        doc.save(path)
+        path = f"data/{self.filename}"
+        self.doc.save(path)
         return path
 
-    def create_excel(self, content, filename=None):
-        """Generates an Excel (.xlsx) file."""
-        if not filename:
-            filename = f"sheet_{uuid.uuid4().hex[:8]}.xlsx"
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        
-        rows = content.strip().split('\n')
-        for row in rows:
-            columns = [c.strip() for c in row.split(',')]
-            ws.append(columns)
-            
-        path = f"data/{filename}"
-        wb.save(path)
+
+class ExcelWriter:
+    """Appends one CSV line per row as it arrives."""
+
+    def __init__(self, filename=None):
+        self.filename = filename or f"sheet_{uuid.uuid4().hex[:8]}.xlsx"
+        self.sections = 0  # Rows written
+        self.bytes_written = 0
+        self.pending_blanks = 0 # Blank lines only become rows once more data follows them
+        self.wb = openpyxl.Workbook()
+        self.ws = self.wb.active
+
+    def write_line(self, line):
+        self.bytes_written += len(line.encode('utf-8')) + 1
+        if not line.strip():
+            if self.sections:
+                self.pending_blanks += 1
+            return
+
+        for _ in range(self.pending_blanks):
+            self.ws.append([''])
+        self.pending_blanks = 0
+
+        columns = [c.strip() for c in line.strip().split(',')]
+        self.ws.append(columns)
+        self.sections += 1
+
+    def finish(self):
+        path = f"data/{self.filename}"
+        self.wb.save(path)
         return path
 
 
@@ -1,14 +1,16 @@
 import numpy as np
+from collections import OrderedDict
 from pypdf import PdfReader
-from mistralai import Mistral
 from sklearn.metrics.pairwise import cosine_similarity
-from config import MISTRAL_API_KEY
+from src.utils.http_pool import get_shared_pool
+from src.utils.single_flight import get_flight
 
 class NativeRAG:
-    def __init__(self):
-        self.client = Mistral(api_key=MISTRAL_API_KEY)
+    def __init__(self, pool=None):
+        self.llm = (pool or get_shared_pool()).llm
         self.vector_db = [] # In-memory storage: [{"text": str, "vector": array}]
         self.chunk_size = 500 # Characters per chunk
+        self.query_cache = OrderedDict() # Recent query embeddings, shared with the response cache
 
     def ingest_pdf(self, file_path):
         """
@@ -29,10 +31,7 @@ class NativeRAG:
         
         # 3. Vectorize in Batch
         # Mistral embeddings API
-        embeddings_batch = self.client.embeddings.create(
-            model="mistral-embed",
-            inputs=chunks
-        )
+        embeddings_batch = self.llm.embed_sync(chunks)
         
         # Store in "DB"
         self.vector_db = [] # Reset for demo (or append for multi-doc)
@@ -54,11 +53,22 @@ class NativeRAG:
             return ""
 
         # Embed User Query
-        query_emb = self.client.embeddings.create(
-            model="mistral-embed",
-            inputs=[query]
-        ).data[0].embedding
+        query_emb = self.embed_query(query)
+        return self._top_k_context(query_emb, top_k)
+
+    async def retrieve_async(self, query, top_k=3, priority="STANDARD", session=None, usage=None):
+        """Same as retrieve(), with the embedding call awaited instead of blocking."""
+        if not self.vector_db:
+            return ""
 
+        async def retrieve():
+            query_emb = await self.embed_query_async(query, priority=priority, session=session, usage=usage)
+            return self._top_k_context(query_emb, top_k)
+
+        # Identical retrievals against the same index share one run
+        return await get_flight("rag.retrieve").do((id(self), len(self.vector_db), query, top_k), retrieve)
+
+    def _top_k_context(self, query_emb, top_k):
         # Convert list to numpy array for speed
         db_vectors = np.array([item["vector"] for item in self.vector_db])
         query_vector = np.array([query_emb])
@@ -71,4 +81,34 @@ class NativeRAG:
         
         # Construct Context String
         context = "\n---\n".join([self.vector_db[i]["text"] for i in top_indices])
-        return context
\ No newline at end of file
+        return context
+
+    def embed_query(self, query):
+        """Embeds a single query, remembering the last few so retrieval and caching pay for it once."""
+        if query in self.query_cache:
+            self.query_cache.move_to_end(query)
+            return self.query_cache[query]
+
+        embedding = self.llm.embed_sync([query], priority="STANDARD", kind="embedding").data[0].embedding
+
+        self._remember_embedding(query, embedding)
+        return embedding
+
+    async def embed_query_async(self, query, priority="STANDARD", session=None, usage=None):
+        if query in self.query_cache:
+            self.query_cache.move_to_end(query)
+            return self.query_cache[query]
+
+        # The response cache and RAG both embed the query at the same moment: pay once
+        response = await get_flight("embeddings").do(
+            query, lambda: self.llm.embed([query], priority=priority, session=session, usage=usage)
+        )
+        embedding = response.data[0].embedding
+
+        self._remember_embedding(query, embedding)
+        return embedding
+
+    def _remember_embedding(self, query, embedding):
+        self.query_cache[query] = embedding
+        if len(self.query_cache) > 64:
+            self.query_cache.popitem(last=False)
\ No newline at end of file
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SearchCache:
+    """
+    LRU cache of search results with a TTL per entry and stale-while-revalidate.
+    An entry is fresh for `ttl` seconds, then stale for `ttl * stale_factor`
+    more: a stale hit is still served at once, and the caller is told to
+    refresh it in the background. After that it is gone.
+    """
+
+    def __init__(self, max_entries=256, stale_factor=3):
+        self.max_entries = max_entries
+        self.stale_factor = stale_factor
+        self.entries = OrderedDict()  # key -> (value, stored_at, ttl)
+        self.lock = threading.Lock()
+        self.stats = {"fresh": 0, "stale": 0, "misses": 0, "refreshes": 0}
+
+    def get(self, key, count_miss=True):
+        """Returns (value, is_stale), or (None, False) on a miss. A lookup that will be retried passes count_miss=False."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += count_miss
+                return None, False
+
+            value, stored_at, ttl = entry
+            age = now - stored_at
+            if age > ttl * (1 + self.stale_factor):
+                del self.entries[key]
+                self.stats["misses"] += count_miss
+                return None, False
+
+            self.entries.move_to_end(key)
+            stale = age > ttl
+            self.stats["stale" if stale else "fresh"] += 1
+            return value, stale
+
+    def put(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic(), ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def note_refresh(self):
+        with self.lock:
+            self.stats["refreshes"] += 1
+
+    def snapshot(self):
+        return dict(self.stats, entries=len(self.entries))
@@ -1,54 +1,169 @@
-from ddgs import DDGS
+import asyncio
 import datetime
+import re
+import threading
+from config import (
+    WEB_CACHE_MAX_ENTRIES, WEB_CACHE_TTLS, WEB_CACHE_CATEGORIES, WEB_CACHE_STALE_FACTOR,
+)
+from src.tools.search_cache import SearchCache
+from src.utils.http_pool import get_shared_pool
+from src.utils.single_flight import get_flight
+
+NO_RESULTS = "No live data found. Search engines returned empty results."
 
 class WebSearchTool:
-    def __init__(self):
-        # We initialize a fresh instance per search to avoid session staleness
-        pass
+    def __init__(self, pool=None):
+        # One long-lived DDGS from the shared pool: its engine sessions keep their connections warm
+        self.pool = pool or get_shared_pool()
+        # Raw results per (cleaned query, mode, result type); stale entries are served while they refresh
+        self.cache = SearchCache(WEB_CACHE_MAX_ENTRIES, WEB_CACHE_STALE_FACTOR)
+        self.refreshing = set()
+        self.lock = threading.Lock()
 
-    def search(self, query, mode="STANDARD"):
+    def search(self, query, mode="STANDARD", max_results=None):
         """
         Adaptive Search:
         - FAST_RESPONSE: Shallow search (3 results), Text only.
         - STANDARD/DEEP: Deep search (8 results), Text + News fallback.
+        `max_results` overrides the mode's depth (the caller's deadline may demand less).
+        Each search type is answered from the cache while it is fresh enough.
         """
         # 1. Clean the query
-        clean_query = query.replace("now", "").split("2026")[0].strip()
+        clean_query = self._clean(query)
         
         # 2. Adjust Depth based on Network Mode
-        if mode == "FAST_RESPONSE":
-            max_results = 3
-        else:
-            max_results = 8
+        if max_results is None:
+            max_results = self._depth(mode)
             
         print(f"[TOOL] 🌐 Adaptive Search ({mode}): {clean_query} | Limit: {max_results}")
         
         try:
-            with DDGS() as ddgs:
-                # 3. Try 'Text' first
-                results = list(ddgs.text(clean_query, region="wt-wt", max_results=max_results))
-                
-                # 4. If Text fails, immediately try 'News'
-                if not results:
-                    print("[TOOL] ⚠️ Text search empty. Trying Live News...")
-                    results = list(ddgs.news(clean_query, region="wt-wt", max_results=max_results))
+            # 3. Try 'Text' first
+            results = self._results("text", clean_query, mode, max_results)
 
-                if not results:
-                    return "No live data found. Search engines returned empty results."
+            # 4. If Text fails, immediately try 'News'
+            if not results:
+                print("[TOOL] ⚠️ Text search empty. Trying Live News...")
+                results = self._results("news", clean_query, mode, max_results)
 
-                # 5. Format for the LLM
-                formatted_results = []
-                for r in results:
-                    # 'body' in text search, 'description' in news
-                    content = r.get('body') or r.get('description', 'No details available.')
-                    formatted_results.append(f"Title: {r['title']}\nSource: {r['href']}\nSnippet: {content}")
+            if not results:
+                return NO_RESULTS
 
-                return "\n\n".join(formatted_results)
+            # 5. Format for the LLM
+            return self._format(results)
 
         except Exception as e:
             print(f"[ERROR] Web Tool Critical Failure: {e}")
             return f"Search Error: The search provider is unreachable. (Detail: {str(e)[:50]})"
 
+    def _format(self, results):
+        formatted_results = []
+        for r in results:
+            # 'body' in text search, 'description' in news
+            content = r.get('body') or r.get('description', 'No details available.')
+            formatted_results.append(f"Title: {r['title']}\nSource: {r['href']}\nSnippet: {content}")
+
+        return "\n\n".join(formatted_results)
+
+    # --- Cache (stale-while-revalidate) ---
+    def _results(self, kind, clean_query, mode, max_results, fetch=True):
+        """
+        Results of one search type ("text" or "news"). Fresh cache entries are
+        returned as they are; stale ones too, while a background refresh runs.
+        On a miss, searches when `fetch` is set, else returns None.
+        """
+        key = (clean_query.lower(), mode, kind)
+        cached, stale = self.cache.get(key, count_miss=fetch)
+        # A shallow earlier search cannot answer a deeper one
+        if cached is not None and cached["depth"] >= max_results:
+            if stale:
+                self._revalidate(key, kind, clean_query, cached["depth"])
+            return cached["results"][:max_results]
+        if not fetch:
+            return None
+
+        results = self._fetch(kind, clean_query, max_results)
+        self.cache.put(key, {"results": results, "depth": max_results}, self._ttl(clean_query, kind))
+        return results
+
+    def _revalidate(self, key, kind, clean_query, depth):
+        """Refreshes one stale entry on a background thread (once, however many readers see it stale)."""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                results = self._fetch(kind, clean_query, depth)
+                self.cache.put(key, {"results": results, "depth": depth}, self._ttl(clean_query, kind))
+                self.cache.note_refresh()
+            except Exception as e:
+                # The stale entry keeps serving until it expires for good
+                print(f"[TOOL] ⚠️ Background refresh of '{clean_query}' ({kind}) failed: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="web-cache-refresh", daemon=True).start()
+
+    def _ttl(self, clean_query, kind):
+        query = clean_query.lower()
+        # Whole words (plurals too): "live" must not match "deliver", nor "news" "newsletter"
+        category = next((c for c, keywords in WEB_CACHE_CATEGORIES.items()
+                         if any(re.search(rf"\b{re.escape(k)}s?\b", query) for k in keywords)), "general")
+        ttl = WEB_CACHE_TTLS[category]
+        # News results are about what just happened, whatever the query
+        return min(ttl, WEB_CACHE_TTLS["news"]) if kind == "news" else ttl
+
+    def _fetch(self, kind, clean_query, max_results):
+        with self.pool.ddgs as ddgs:
+            search = ddgs.text if kind == "text" else ddgs.news
+            return self._recorded(f"ddgs.{kind}", lambda: list(search(clean_query, region="wt-wt", max_results=max_results)),
+                                  clean_query, max_results)
+
+    def _recorded(self, kind, search, clean_query, max_results):
+        """DDGS does not go through httpx, so the emulator and the cassette hook in at the call level."""
+        if self.pool.emulator:
+            blocking = search
+            search = lambda: self.pool.emulator.call(blocking)
+        if not self.pool.cassette:
+            return search()
+        # The depth comes from the deadline, so it is not part of the key
+        return self.pool.cassette.call(kind, [clean_query], search)[:max_results]
+
+    def _clean(self, query):
+        return query.replace("now", "").split("2026")[0].strip()
+
+    def _depth(self, mode):
+        return 3 if mode == "FAST_RESPONSE" else 8
+
+    def _cached_answer(self, query, mode, max_results):
+        """The formatted answer from the cache alone, or None if a search is needed."""
+        clean_query = self._clean(query)
+        max_results = max_results or self._depth(mode)
+        for kind in ("text", "news"):
+            results = self._results(kind, clean_query, mode, max_results, fetch=False)
+            if results is None:
+                return None
+            if results:
+                return self._format(results)
+        return NO_RESULTS
+
+    async def search_async(self, query, mode="STANDARD", max_results=None):
+        """
+        A cached answer comes straight back, without leaving the event loop.
+        Otherwise: DDGS has no async API, so the blocking search runs on a worker thread.
+        Concurrent identical searches (same cleaned query and depth) share one run.
+        """
+        cached = self._cached_answer(query, mode, max_results)
+        if cached is not None:
+            print(f"[TOOL] ⚡ Search served from cache: {self._clean(query)}")
+            return cached
+
+        key = (self._clean(query).lower(), mode, max_results or self._depth(mode))
+        return await get_flight("web.search").do(key, lambda: asyncio.to_thread(self.search, query, mode, max_results))
+
 # from ddgs import DDGS  # Use the new import
 # import datetime
 
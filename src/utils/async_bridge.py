@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+# One event loop per process, running on a daemon thread. Every sync caller
+# (Streamlit script threads, CLI code) schedules work onto it, so hundreds of
+# concurrent chat streams share one loop instead of one thread each.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """Returns the shared background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="agent-event-loop", daemon=True)
+            thread.start()
+    return _loop
+
+
+def run_sync(coro, timeout=None):
+    """Runs a coroutine on the shared loop and blocks the calling thread for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+def iterate_sync(agen):
+    """
+    Drives an async generator from synchronous code, one item at a time.
+    If the consumer stops early (closes the generator), the async generator
+    is closed on the loop too so upstream streams are torn down.
+    """
+    loop = get_loop()
+    finished = False
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                finished = True
+                return
+            yield item
+    finally:
+        if not finished:
+            asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
@@ -0,0 +1,74 @@
+import asyncio
+from src.utils.async_bridge import get_loop
+
+# Process-wide tally of what cancelled requests had already cost upstream
+_waste = {"cancelled_requests": 0, "closed_streams": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+class CancelToken:
+    """
+    Cancellation handle for one request. `cancel()` may be called from any
+    thread (e.g. the Streamlit script thread); the request's pipeline, run
+    under `guard()`, stops at its next await, which tears down whatever it
+    was waiting on: open Mistral streams close their HTTP connection, tool
+    tasks are cancelled, and pool slots are freed right away.
+    """
+
+    def __init__(self):
+        self.reason = None
+        self._event = None
+        self.wasted = {"prompt_tokens": 0, "completion_tokens": 0}
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason="cancelled"):
+        if self.reason is not None:
+            return
+        self.reason = reason
+        _waste["cancelled_requests"] += 1
+        loop = get_loop()
+        if self._event is not None:
+            loop.call_soon_threadsafe(self._event.set)
+
+    def record_waste(self, model, prompt_tokens, completion_tokens):
+        """Called by a stream that was closed early because of this token."""
+        self.wasted["prompt_tokens"] += prompt_tokens
+        self.wasted["completion_tokens"] += completion_tokens
+        _waste["closed_streams"] += 1
+        _waste["prompt_tokens"] += prompt_tokens
+        _waste["completion_tokens"] += completion_tokens
+        print(f"[CANCEL] Closed {model} stream early: ~{prompt_tokens} prompt + ~{completion_tokens} completion tokens wasted.")
+
+    async def guard(self, agen):
+        """Passes items through from `agen` until the token is cancelled, then closes it."""
+        self._event = asyncio.Event()
+        if self.cancelled:
+            self._event.set()
+        waiter = asyncio.ensure_future(self._event.wait())
+        try:
+            while True:
+                step = asyncio.ensure_future(agen.__anext__())
+                await asyncio.wait({step, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                if not step.done():
+                    # Interrupt whatever the pipeline is waiting on and let its cleanup run
+                    step.cancel()
+                    await asyncio.gather(step, return_exceptions=True)
+                    print(f"[CANCEL] Request stopped: {self.reason}")
+                    return
+                try:
+                    item = step.result()
+                except StopAsyncIteration:
+                    return
+                yield item
+                if self.cancelled:
+                    print(f"[CANCEL] Request stopped: {self.reason}")
+                    return
+        finally:
+            waiter.cancel()
+            await agen.aclose()
+
+
+def waste_stats():
+    return dict(_waste)
@@ -0,0 +1,287 @@
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+import httpx
+from config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_REPLAY_TIMING, CASSETTE_SCRUB_PATTERNS, CASSETTE_VOLATILE_FIELDS
+
+# Headers that differ on every run (or carry secrets) and never belong in a cassette
+SKIP_HEADERS = {"authorization", "date", "set-cookie", "cf-ray", "x-request-id", "x-kong-request-id"}
+
+
+class CassetteMiss(httpx.HTTPError):
+    """Replay found no recording for a request. Not transient: retrying cannot help."""
+
+
+class Cassette:
+    """
+    Record/replay of every outbound call, for reproducible performance runs.
+    - record: calls go out as usual; each request, response and streamed chunk
+      (with its offset from the start of the call) is appended to a gzip JSONL file.
+    - replay: nothing leaves the process; answers come from the file, either
+      with their recorded timing ("original") or as fast as possible ("fast").
+    HTTP traffic (Mistral, sentinel probes) is captured at the httpx transport
+    layer via `wrap()`/`wrap_async()`; non-HTTP calls (DuckDuckGo) via `call()`.
+    """
+
+    def __init__(self, mode, path, timing="original", scrub_patterns=(), volatile_fields=()):
+        self.mode = mode
+        self.path = path
+        self.timing = timing
+        self.scrub = [re.compile(p) for p in scrub_patterns]
+        self.volatile_fields = set(volatile_fields)
+        self.lock = threading.Lock()
+        self.stats = {"recorded": 0, "replayed": 0, "missed": 0}
+
+        print(f"[CASSETTE] {mode.capitalize()} mode: {path}" + (f" (timing: {timing})" if mode == "replay" else ""))
+        if mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = gzip.open(path, "at", encoding="utf-8")
+        elif mode == "replay":
+            self._load()
+
+    # --- Keys ---
+    def key(self, kind, target, payload=b""):
+        """Fingerprint of a call: kind + target + payload with volatile parts scrubbed."""
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8", errors="replace")
+        payload = self._without_volatile_fields(payload)
+        for pattern in self.scrub:
+            payload = pattern.sub("<SCRUBBED>", payload)
+        digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return f"{kind} {target} {digest}"
+
+    def _without_volatile_fields(self, payload):
+        """Drops CASSETTE_VOLATILE_FIELDS (e.g. a deadline-sized max_tokens) from a JSON object body."""
+        try:
+            body = json.loads(payload) if payload else None
+        except ValueError:
+            return payload
+        if not isinstance(body, dict) or not self.volatile_fields & body.keys():
+            return payload
+        return json.dumps({k: v for k, v in body.items() if k not in self.volatile_fields}, sort_keys=True)
+
+    # --- Storage ---
+    def _load(self):
+        self.exact = defaultdict(deque)   # key -> recordings, in recorded order
+        if not os.path.exists(self.path):
+            print(f"[CASSETTE] ⚠️ {self.path} not found. Every call will miss.")
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.exact[entry["key"]].append(entry)
+            except EOFError:
+                pass  # Recording was interrupted before the gzip trailer; keep what we have
+        print(f"[CASSETTE] Loaded {sum(len(q) for q in self.exact.values())} recordings.")
+
+    def save(self, entry):
+        with self.lock:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._file.flush()
+            self.stats["recorded"] += 1
+
+    def find(self, key):
+        """
+        Next recording for `key`. Identical calls replay their recordings in
+        order (the last one repeats). A call whose payload changed is a miss:
+        another request's answer would be wrong, not just differently timed.
+        """
+        with self.lock:
+            recordings = self.exact.get(key)
+            if recordings:
+                entry = recordings.popleft() if len(recordings) > 1 else recordings[0]
+                self.stats["replayed"] += 1
+                return entry
+            self.stats["missed"] += 1
+        print(f"[CASSETTE] ⚠️ Miss: no recording for {key}")
+        raise CassetteMiss(f"No recording for {key}")
+
+    def close(self):
+        if self.mode == "record":
+            with self.lock:
+                self._file.close()
+
+    # --- Timing ---
+    def delays(self, offsets):
+        """Sleep before each recorded event, to reproduce its offset from the previous one."""
+        previous = 0.0
+        for offset in offsets:
+            yield max(0.0, offset - previous) if self.timing == "original" else 0.0
+            previous = offset
+
+    # --- Transports ---
+    def wrap(self, transport):
+        return RecordingTransport(transport, self) if self.mode == "record" else ReplayTransport(self)
+
+    def wrap_async(self, transport):
+        return AsyncRecordingTransport(transport, self) if self.mode == "record" else AsyncReplayTransport(self)
+
+    # --- Non-HTTP calls ---
+    def call(self, kind, args, fn):
+        """Records or replays a blocking call whose result is JSON-serializable."""
+        key = self.key(kind, "call", json.dumps(args, sort_keys=True))
+        if self.mode == "replay":
+            entry = self.find(key)
+            for delay in self.delays([entry["duration"]]):
+                time.sleep(delay)
+            return entry["result"]
+
+        start = time.monotonic()
+        result = fn()
+        self.save({"key": key, "duration": time.monotonic() - start, "result": result})
+        return result
+
+
+def _new_entry(cassette, request, response, started):
+    return {
+        "key": _request_key(cassette, request),
+        "status": response.status_code,
+        "headers": [(k, v) for k, v in response.headers.multi_items() if k.lower() not in SKIP_HEADERS],
+        "headers_at": time.monotonic() - started,
+        "chunks": [],  # [offset seconds, base64 bytes]
+    }
+
+
+def _request_key(cassette, request):
+    return cassette.key(request.method, str(request.url), request.content)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream, cassette, entry, started):
+        self.stream, self.cassette, self.entry, self.started = stream, cassette, entry, started
+
+    def __iter__(self):
+        for chunk in self.stream:
+            self.entry["chunks"].append([time.monotonic() - self.started, base64.b64encode(chunk).decode()])
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+        self.cassette.save(self.entry)
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, cassette, entry, started):
+        self.stream, self.cassette, self.entry, self.started = stream, cassette, entry, started
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            self.entry["chunks"].append([time.monotonic() - self.started, base64.b64encode(chunk).decode()])
+            yield chunk
+
+    async def aclose(self):
+        await self.stream.aclose()
+        self.cassette.save(self.entry)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    def __init__(self, inner, cassette):
+        self.inner, self.cassette = inner, cassette
+
+    def handle_request(self, request):
+        started = time.monotonic()
+        response = self.inner.handle_request(request)
+        entry = _new_entry(self.cassette, request, response, started)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_RecordingStream(response.stream, self.cassette, entry, started),
+                              extensions=response.extensions)
+
+    def close(self):
+        self.inner.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner, cassette):
+        self.inner, self.cassette = inner, cassette
+
+    async def handle_async_request(self, request):
+        started = time.monotonic()
+        response = await self.inner.handle_async_request(request)
+        entry = _new_entry(self.cassette, request, response, started)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_AsyncRecordingStream(response.stream, self.cassette, entry, started),
+                              extensions=response.extensions)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, cassette, entry):
+        self.cassette, self.entry = cassette, entry
+
+    def __iter__(self):
+        offsets = [self.entry["headers_at"]] + [offset for offset, _ in self.entry["chunks"]]
+        delays = self.cassette.delays(offsets)
+        next(delays)  # The header wait was already served
+        for (_, data), delay in zip(self.entry["chunks"], delays):
+            time.sleep(delay)
+            yield base64.b64decode(data)
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, cassette, entry):
+        self.cassette, self.entry = cassette, entry
+
+    async def __aiter__(self):
+        offsets = [self.entry["headers_at"]] + [offset for offset, _ in self.entry["chunks"]]
+        delays = self.cassette.delays(offsets)
+        next(delays)
+        for (_, data), delay in zip(self.entry["chunks"], delays):
+            await asyncio.sleep(delay)
+            yield base64.b64decode(data)
+
+
+class ReplayTransport(httpx.BaseTransport):
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+    def handle_request(self, request):
+        entry = self.cassette.find(_request_key(self.cassette, request))
+        time.sleep(next(self.cassette.delays([entry["headers_at"]])))
+        return httpx.Response(entry["status"], headers=entry["headers"], stream=_ReplayStream(self.cassette, entry),
+                              extensions={"recorded_seconds": entry["headers_at"]})
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+    async def handle_async_request(self, request):
+        entry = self.cassette.find(_request_key(self.cassette, request))
+        await asyncio.sleep(next(self.cassette.delays([entry["headers_at"]])))
+        return httpx.Response(entry["status"], headers=entry["headers"], stream=_AsyncReplayStream(self.cassette, entry),
+                              extensions={"recorded_seconds": entry["headers_at"]})
+
+
+_cassette = None
+_configured = False
+
+
+def configure_cassette(mode, path=CASSETTE_PATH, timing=CASSETTE_REPLAY_TIMING):
+    """Overrides the config.py setting. Call before the shared HTTP pool is created."""
+    global _cassette, _configured
+    _cassette = Cassette(mode, path, timing, CASSETTE_SCRUB_PATTERNS, CASSETTE_VOLATILE_FIELDS) if mode else None
+    if _cassette and mode == "record":
+        atexit.register(_cassette.close)
+    _configured = True
+    return _cassette
+
+
+def get_cassette():
+    """The process-wide cassette, or None when running live."""
+    if not _configured:
+        configure_cassette(CASSETTE_MODE)
+    return _cassette
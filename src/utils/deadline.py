@@ -0,0 +1,35 @@
+import time
+
+
+class Deadline:
+    """
+    End-to-end latency budget for one request. Created once per
+    execute_stream call and handed to every stage, which sizes its own work
+    (result counts, top_k, max_tokens) from what is left, or skips itself.
+    """
+
+    def __init__(self, seconds, start=None):
+        self.budget = seconds
+        self.start = start if start is not None else time.monotonic()
+        self.expires = self.start + seconds
+        self.missed = False  # Set by a stage that had to cut its work short
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def expired(self):
+        return self.remaining() <= 0.0
+
+    def allows(self, seconds):
+        """True if at least `seconds` of budget are left."""
+        return self.remaining() >= seconds
+
+    def cap(self, seconds, share=1.0):
+        """A stage timeout: its own limit, but never more than `share` of what is left."""
+        return min(seconds, self.remaining() * share)
+
+    def __repr__(self):
+        return f"Deadline({self.budget}s, {self.remaining():.2f}s left)"
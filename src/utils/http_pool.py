@@ -0,0 +1,97 @@
+import importlib.util
+import threading
+import httpx
+from ddgs import DDGS
+from mistralai import Mistral
+from config import (
+    MISTRAL_API_KEY, MISTRAL_SERVER_URL, HTTP_POOL_MAX_CONNECTIONS, HTTP_POOL_MAX_KEEPALIVE,
+    HTTP_POOL_KEEPALIVE_EXPIRY, HTTP_WARM_UP_URLS,
+)
+from src.utils.async_bridge import run_sync
+from src.utils.cassette import get_cassette
+from src.utils.llm_gateway import LLMGateway
+from src.utils.net_emulator import get_emulator
+
+# HTTP/2 needs the optional 'h2' package; without it we stay on pooled HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HttpPool:
+    """
+    Process-wide connection pool shared by every outbound call.
+    One sync and one async httpx client (keep-alive, size limits, HTTP/2 when
+    available), one Mistral client built on top of them (reached through the
+    LLMGateway in `llm`), and one long-lived DDGS instance. Components receive
+    this object instead of opening their own connections, so DNS + TCP + TLS
+    is paid once per host, not once per call.
+
+    The async client belongs to the shared event loop in async_bridge; only
+    await it from there.
+    """
+
+    def __init__(self, server_url=MISTRAL_SERVER_URL):
+        limits = httpx.Limits(
+            max_connections=HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+        )
+        # Long read timeout: LLM streams can legitimately stay open for a minute
+        timeout = httpx.Timeout(60.0, connect=5.0)
+
+        transport = httpx.HTTPTransport(http2=HTTP2_AVAILABLE, limits=limits)
+        async_transport = httpx.AsyncHTTPTransport(http2=HTTP2_AVAILABLE, limits=limits)
+
+        # Emulated network conditions apply right at the wire, so a recording captures them too
+        self.emulator = get_emulator()
+        if self.emulator:
+            transport = self.emulator.wrap(transport)
+            async_transport = self.emulator.wrap_async(async_transport)
+
+        # Record/replay: the cassette sits between the clients and the network
+        self.cassette = get_cassette()
+        if self.cassette:
+            transport = self.cassette.wrap(transport)
+            async_transport = self.cassette.wrap_async(async_transport)
+
+        self.client = httpx.Client(transport=transport, timeout=timeout, follow_redirects=True)
+        self.async_client = httpx.AsyncClient(transport=async_transport, timeout=timeout, follow_redirects=True)
+        self.mistral = Mistral(api_key=MISTRAL_API_KEY, server_url=server_url,
+                               client=self.client, async_client=self.async_client)
+        self.llm = LLMGateway(self.mistral)
+        self.ddgs = DDGS()
+
+        print(f"[POOL] Shared HTTP pool ready (HTTP/2: {HTTP2_AVAILABLE}, max {HTTP_POOL_MAX_CONNECTIONS} connections)")
+
+    def warm_up(self, urls=HTTP_WARM_UP_URLS):
+        """
+        Opens connections to the hosts we are about to need, in the background,
+        so the first real request finds a warm socket in each client's pool.
+        Skipped under a cassette: replays have no sockets to warm.
+        """
+        if self.cassette:
+            return
+
+        def _warm():
+            for url in urls:
+                try:
+                    self.client.head(url, timeout=3)
+                    run_sync(self.async_client.head(url, timeout=3))
+                except httpx.HTTPError as e:
+                    print(f"[POOL] ⚠️ Warm-up failed for {url}: {e}")
+            print(f"[POOL] Warm-up finished for {len(urls)} hosts.")
+
+        threading.Thread(target=_warm, name="http-pool-warm-up", daemon=True).start()
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pool():
+    """Returns the process-wide pool, creating and warming it on first use."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = HttpPool()
+            _shared_pool.warm_up()
+    return _shared_pool
@@ -0,0 +1,143 @@
+import time
+from src.utils.async_bridge import run_sync
+from src.utils.request_policy import get_policy
+from src.utils.scheduler import get_scheduler
+from src.utils.tokens import estimate_tokens
+from src.utils.usage import get_ledger
+
+
+def _prompt_text(messages):
+    return " ".join(str(m.get("content", "")) for m in messages)
+
+
+class LLMGateway:
+    """
+    Single doorway for every Mistral call (router, embeddings, answers, docs).
+    Each call goes through the RequestPolicy of its endpoint, so hedging,
+    retries and retry budgets apply uniformly. Each call is admitted once by
+    the shared Scheduler under the caller's `priority` (a reasoning mode or
+    "BACKGROUND") and `session`, before the policy starts its clock: queueing
+    is not upstream latency, and a queued call must not be hedged back into
+    the queue it is stuck in. Retries and hedges are already capped by the
+    policy's RetryBudget. Token usage of every call is booked in
+    the UsageLedger under `kind`, and on the caller's RequestUsage (`usage`).
+    When a NetworkSentinel is attached, it is fed what real calls measure:
+    time to first token, stream throughput and embedding round trips
+    (timed from admission, so queueing in the scheduler does not count).
+    """
+
+    def __init__(self, mistral, scheduler=None):
+        self.mistral = mistral
+        self.scheduler = scheduler or get_scheduler()
+        self.ledger = get_ledger()
+        self.sentinel = None  # Set by NetworkSentinel.start()
+
+    def _observe(self, kind, value, model=None, prompt_tokens=0):
+        if self.sentinel is not None:
+            self.sentinel.record_passive(kind, value, model, prompt_tokens)
+
+    async def complete(self, model, messages, priority="STANDARD", session=None, kind="chat", usage=None, **kwargs):
+        policy = get_policy(f"chat.complete:{model}")
+
+        async def attempt():
+            return await self.mistral.chat.complete_async(model=model, messages=messages, **kwargs)
+
+        await self.scheduler.admit(model, priority, session)
+        response = await policy.call(attempt)
+        reported = getattr(response, "usage", None)
+        if reported is not None:
+            self.ledger.record(kind, model, reported.prompt_tokens, reported.completion_tokens,
+                               session=session, mode=priority, request=usage)
+        else:
+            answer = response.choices[0].message.content or ""
+            self.ledger.record(kind, model, estimate_tokens(_prompt_text(messages)), estimate_tokens(answer),
+                               estimated=True, session=session, mode=priority, request=usage)
+        return response
+
+    async def embed(self, inputs, model="mistral-embed", priority="STANDARD", session=None, kind="embedding", usage=None):
+        policy = get_policy(f"embeddings:{model}")
+
+        async def attempt():
+            sent = time.monotonic()
+            response = await self.mistral.embeddings.create_async(model=model, inputs=inputs)
+            self._observe("embedding", (time.monotonic() - sent) * 1000, model, sum(estimate_tokens(i) for i in inputs))
+            return response
+
+        await self.scheduler.admit(model, priority, session)
+        response = await policy.call(attempt)
+        reported = getattr(response, "usage", None)
+        if reported is not None:
+            self.ledger.record(kind, model, reported.prompt_tokens, 0, session=session, mode=priority, request=usage)
+        else:
+            self.ledger.record(kind, model, sum(estimate_tokens(i) for i in inputs), 0,
+                               estimated=True, session=session, mode=priority, request=usage)
+        return response
+
+    def embed_sync(self, inputs, model="mistral-embed", priority="BACKGROUND", kind="ingestion"):
+        """For synchronous callers (PDF ingestion from the UI thread)."""
+        return run_sync(self.embed(inputs, model=model, priority=priority, kind=kind))
+
+    async def stream(self, model, messages, priority="STANDARD", session=None, cancel=None,
+                     kind="stream", usage=None, **kwargs):
+        """
+        Async generator of chunks. The policy covers opening the stream up to
+        its first chunk (that is where tail latency lives); once a stream has
+        produced a chunk we are committed to it.
+        Closing the generator closes the HTTP stream. If that happens because
+        the `cancel` token fired, what the stream had cost is recorded as waste.
+        Usage comes from the final chunk when Mistral sends it, else from our estimate.
+        """
+        policy = get_policy(f"chat.stream:{model}")
+
+        async def open_stream():
+            sent = time.monotonic()
+            stream = await self.mistral.chat.stream_async(model=model, messages=messages, **kwargs)
+            try:
+                first = await stream.__anext__()
+                self._observe("ttft", (time.monotonic() - sent) * 1000, model, estimate_tokens(_prompt_text(messages)))
+            except StopAsyncIteration:
+                first = None
+            except BaseException:
+                # Includes cancellation of a hedge loser: close its connection
+                await stream.__aexit__(None, None, None)
+                raise
+            return stream, first
+
+        async def close(opened):
+            await opened[0].__aexit__(None, None, None)
+
+        await self.scheduler.admit(model, priority, session)
+        stream, first = await policy.call(open_stream, cleanup=close)
+        first_at = time.monotonic()
+        received = []
+        reported = None
+        finished = False
+        async with stream:
+            try:
+                if first is None:
+                    finished = True
+                    return
+                received.append(first.data.choices[0].delta.content or "")
+                yield first
+                async for chunk in stream:
+                    received.append(chunk.data.choices[0].delta.content or "")
+                    reported = getattr(chunk.data, "usage", None) or reported
+                    yield chunk
+                finished = True
+            finally:
+                prompt_tokens = estimate_tokens(_prompt_text(messages))
+                completion_tokens = estimate_tokens("".join(received))
+                elapsed = time.monotonic() - first_at
+                # Short answers are all first-token latency; they say nothing about throughput.
+                # Streams cut by a deadline still count: slow links are exactly the ones that get cut.
+                if completion_tokens >= 16 and elapsed > 0:
+                    self._observe("tokens_per_second", completion_tokens / elapsed)
+                if reported is not None:
+                    self.ledger.record(kind, model, reported.prompt_tokens, reported.completion_tokens,
+                                       session=session, mode=priority, request=usage)
+                else:
+                    # Cut-off streams never see the usage chunk; they still cost what they streamed
+                    self.ledger.record(kind, model, prompt_tokens, completion_tokens,
+                                       estimated=True, session=session, mode=priority, request=usage)
+                if not finished and cancel is not None and cancel.cancelled:
+                    cancel.record_waste(model, prompt_tokens, completion_tokens)
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from config import (
+    GOVERNOR_MAX_IN_FLIGHT, GOVERNOR_MAX_QUEUE, GOVERNOR_QUEUE_TIMEOUT,
+    GOVERNOR_QUEUE_DEPTH_HIGH, GOVERNOR_WAIT_HIGH, GOVERNOR_CPU_HIGH, GOVERNOR_CPU_WINDOW,
+    GOVERNOR_ELEVATED, GOVERNOR_HIGH, GOVERNOR_MIN_DWELL,
+)
+from src.utils.scheduler import get_scheduler
+
+LEVELS = ["NORMAL", "ELEVATED", "HIGH"]
+
+# What each pressure level allows. Modes only ever get cheaper.
+DOWNGRADES = {
+    "NORMAL": {},
+    "ELEVATED": {"DEEP_REASONING": "STANDARD"},
+    "HIGH": {"DEEP_REASONING": "FAST_RESPONSE", "STANDARD": "FAST_RESPONSE"},
+}
+
+
+class LoadGovernor:
+    """
+    Watches our own load: requests in flight, how long they wait for a slot,
+    how many Mistral calls are queued in the scheduler, and the CPU this
+    process uses (not the system load average, which lags by a minute and
+    counts every other process on the host). The worst of
+    these, normalized so 1.0 means "high", is the pressure score.
+    - Mode selection: under pressure, DEEP_REASONING drops to STANDARD and then
+      everything drops to FAST_RESPONSE. Levels go up at once but only come
+      down below a lower threshold after GOVERNOR_MIN_DWELL, so modes do not flap.
+    - Admission: at most GOVERNOR_MAX_IN_FLIGHT requests run; up to
+      GOVERNOR_MAX_QUEUE wait (for GOVERNOR_QUEUE_TIMEOUT at most); the rest are shed.
+    """
+
+    def __init__(self):
+        self.slots = asyncio.Semaphore(GOVERNOR_MAX_IN_FLIGHT)
+        self.in_flight = 0
+        self.waiting = 0
+        self.wait_ewma = 0.0
+        self.level = "NORMAL"
+        self.level_since = time.monotonic()
+        self.pinned = None  # a level to hold regardless of pressure (test runs)
+        self.stats = {"admitted": 0, "shed": 0, "downgraded": 0}
+        self.cpu = 0.0
+        self.cpu_sample = (time.monotonic(), time.process_time())
+
+    # --- Admission ---
+    async def admit(self):
+        """Takes a slot. Returns the seconds waited, or None if the request is shed."""
+        if self.waiting >= GOVERNOR_MAX_QUEUE:
+            return self._shed("queue full")
+
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=GOVERNOR_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return self._shed(f"no slot within {GOVERNOR_QUEUE_TIMEOUT}s")
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.wait_ewma = 0.8 * self.wait_ewma + 0.2 * waited
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        return waited
+
+    def release(self):
+        self.in_flight -= 1
+        self.slots.release()
+
+    def _shed(self, why):
+        self.stats["shed"] += 1
+        # A shed request also counts as a long wait, so pressure reflects it
+        self.wait_ewma = 0.8 * self.wait_ewma + 0.2 * GOVERNOR_QUEUE_TIMEOUT
+        print(f"[GOVERNOR] 🚫 Shedding request: {why} ({self.in_flight} in flight, {self.waiting} waiting).")
+        return None
+
+    # --- Pressure ---
+    def cpu_load(self):
+        """Cores' worth of CPU this process used, averaged over at least GOVERNOR_CPU_WINDOW seconds."""
+        now, used = time.monotonic(), time.process_time()
+        then, used_then = self.cpu_sample
+        if now - then >= GOVERNOR_CPU_WINDOW:
+            self.cpu = (used - used_then) / (now - then)
+            self.cpu_sample = (now, used)
+        return self.cpu
+
+    def pressure(self):
+        queued_calls = sum(q.depth() for q in get_scheduler().queues.values())
+        signals = {
+            "in_flight": self.in_flight / GOVERNOR_MAX_IN_FLIGHT,
+            "admission_wait": self.wait_ewma / GOVERNOR_WAIT_HIGH,
+            "api_queue": queued_calls / GOVERNOR_QUEUE_DEPTH_HIGH,
+            "cpu": self.cpu_load() / GOVERNOR_CPU_HIGH,
+        }
+        return max(signals.values()), signals
+
+    def current_level(self):
+        if self.pinned:
+            self.level = self.pinned
+            return self.level
+        score, signals = self.pressure()
+        index = LEVELS.index(self.level)
+        thresholds = [None, GOVERNOR_ELEVATED, GOVERNOR_HIGH]
+
+        # Up: immediately, as far as the score says
+        target = index
+        while target < len(LEVELS) - 1 and score >= thresholds[target + 1][0]:
+            target += 1
+        # Down: one step at a time, only below the exit threshold and after the dwell time
+        if target == index and index > 0 and score < thresholds[index][1]:
+            if time.monotonic() - self.level_since >= GOVERNOR_MIN_DWELL:
+                target = index - 1
+
+        if target != index:
+            worst = max(signals, key=signals.get)
+            print(f"[GOVERNOR] Load {self.level} -> {LEVELS[target]} (pressure {score:.2f}, driven by {worst}).")
+            self.level = LEVELS[target]
+            self.level_since = time.monotonic()
+        return self.level
+
+    def adjust(self, mode):
+        """The mode this request may afford under current load."""
+        level = self.current_level()
+        adjusted = DOWNGRADES[level].get(mode, mode)
+        if adjusted != mode:
+            self.stats["downgraded"] += 1
+            print(f"[GOVERNOR] ⬇️ {mode} -> {adjusted} (load {level}).")
+        return adjusted
+
+    def snapshot(self):
+        score, signals = self.pressure()
+        return {
+            "level": self.level,
+            "pressure": round(score, 2),
+            "signals": {k: round(v, 2) for k, v in signals.items()},
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            **self.stats,
+        }
+
+
+_governor = None
+
+
+def get_governor():
+    """Process-wide: load is a property of the server, not of one session's agent."""
+    global _governor
+    if _governor is None:
+        _governor = LoadGovernor()
+    return _governor
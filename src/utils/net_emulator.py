@@ -0,0 +1,339 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import httpx
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import EMULATOR_RETRANSMIT_PENALTY
+
+
+class NetworkConditions:
+    """
+    One emulated network: a latency distribution (ms) per request, loss
+    (each lost packet costs a retransmit wait), hard failures (connection
+    refused/reset) and a bandwidth cap on response bodies.
+    distribution: "normal" (latency ± jitter), "lognormal" (median latency,
+    heavy tail), or "uniform" (latency - jitter .. latency + jitter).
+    """
+
+    def __init__(self, name, latency_ms=0, jitter_ms=0, distribution="normal",
+                 loss=0.0, failure_rate=0.0, bandwidth_kbps=None):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.loss = loss
+        self.failure_rate = failure_rate
+        self.bandwidth_kbps = bandwidth_kbps
+        self.random = random.Random(name)  # Same name, same sequence: runs are comparable
+
+    def sample_delay(self):
+        """Seconds until the response starts, for one request."""
+        base, spread = self.latency_ms, self.jitter_ms
+        if self.distribution == "lognormal" and base > 0:
+            ms = self.random.lognormvariate(0, spread / base if spread else 0) * base
+        elif self.distribution == "uniform":
+            ms = self.random.uniform(base - spread, base + spread)
+        else:
+            ms = self.random.gauss(base, spread)
+        delay = max(0.0, ms) / 1000
+
+        # Every lost packet waits out a retransmit timeout, doubling like TCP's
+        penalty = EMULATOR_RETRANSMIT_PENALTY
+        while self.random.random() < self.loss:
+            delay += penalty
+            penalty *= 2
+        return delay
+
+    def should_fail(self):
+        return self.random.random() < self.failure_rate
+
+    def transfer_delay(self, size):
+        """Seconds to receive `size` bytes under the bandwidth cap."""
+        if not self.bandwidth_kbps:
+            return 0.0
+        return size * 8 / (self.bandwidth_kbps * 1000)
+
+    def as_dict(self):
+        return {
+            "name": self.name, "latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms,
+            "distribution": self.distribution, "loss": self.loss,
+            "failure_rate": self.failure_rate, "bandwidth_kbps": self.bandwidth_kbps,
+        }
+
+
+class NetworkEmulator:
+    """
+    Injects NetworkConditions into everything that leaves the process:
+    httpx traffic (Mistral calls, sentinel probes) through wrapped
+    transports, and blocking non-HTTP calls (DDGS search) through `call`.
+    Conditions can be switched at any time; the next request picks them up.
+    """
+
+    def __init__(self, conditions=None):
+        self.conditions = conditions or NetworkConditions("ideal")
+        self.stats = {"requests": 0, "failures": 0}
+
+    def set_conditions(self, conditions):
+        print(f"[EMULATOR] Network now '{conditions.name}': {conditions.as_dict()}")
+        self.conditions = conditions
+
+    def _before(self, request=None):
+        """The delay to apply before this request, or an httpx error if it fails."""
+        conditions = self.conditions
+        self.stats["requests"] += 1
+        delay = conditions.sample_delay()
+        if conditions.should_fail():
+            self.stats["failures"] += 1
+            return delay, httpx.ConnectError(f"Emulated failure ({conditions.name})", request=request)
+        return delay, None
+
+    def wrap(self, transport):
+        return EmulatedTransport(transport, self)
+
+    def wrap_async(self, transport):
+        return AsyncEmulatedTransport(transport, self)
+
+    def call(self, fn):
+        """Runs a blocking call as if it crossed the emulated network."""
+        delay, error = self._before()
+        time.sleep(delay)
+        if error:
+            raise error
+        return fn()
+
+
+class _ThrottledStream(httpx.SyncByteStream):
+    def __init__(self, stream, conditions):
+        self.stream, self.conditions = stream, conditions
+
+    def __iter__(self):
+        for chunk in self.stream:
+            time.sleep(self.conditions.transfer_delay(len(chunk)))
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+
+class _AsyncThrottledStream(httpx.AsyncByteStream):
+    def __init__(self, stream, conditions):
+        self.stream, self.conditions = stream, conditions
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            await asyncio.sleep(self.conditions.transfer_delay(len(chunk)))
+            yield chunk
+
+    async def aclose(self):
+        await self.stream.aclose()
+
+
+class EmulatedTransport(httpx.BaseTransport):
+    def __init__(self, inner, emulator):
+        self.inner, self.emulator = inner, emulator
+
+    def handle_request(self, request):
+        delay, error = self.emulator._before(request)
+        time.sleep(delay)
+        if error:
+            raise error
+        response = self.inner.handle_request(request)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_ThrottledStream(response.stream, self.emulator.conditions),
+                              extensions=response.extensions)
+
+    def close(self):
+        self.inner.close()
+
+
+class AsyncEmulatedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner, emulator):
+        self.inner, self.emulator = inner, emulator
+
+    async def handle_async_request(self, request):
+        delay, error = self.emulator._before(request)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        response = await self.inner.handle_async_request(request)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_AsyncThrottledStream(response.stream, self.emulator.conditions),
+                              extensions=response.extensions)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+_emulator = None
+
+
+def configure_emulator(conditions):
+    """Turns emulation on (or off with None). Call before the HTTP pool is created."""
+    global _emulator
+    _emulator = NetworkEmulator(conditions) if conditions else None
+    return _emulator
+
+
+def get_emulator():
+    """The process-wide emulator, or None on a real network."""
+    return _emulator
+
+
+# --- Stand-in backends ---
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._send_json(200, None)
+
+    def do_GET(self):
+        self._send_json(200, {"status": "ok"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server.stand_in
+        if self.path.endswith("/embeddings"):
+            self._send_json(200, server.embedding_response(body))
+        elif self.path.endswith("/chat/completions") and body.get("stream"):
+            self._send_stream(server.stream_chunks(body))
+        elif self.path.endswith("/chat/completions"):
+            self._send_json(200, server.completion_response(body))
+        else:
+            self._send_json(404, {"message": f"Unknown endpoint {self.path}"})
+
+    def _send_json(self, status, payload):
+        data = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def _send_stream(self, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for delay, event in chunks:
+                time.sleep(delay)
+                data = f"data: {event}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # The client cut the stream (deadline or cancel)
+
+
+class StandInServer:
+    """
+    Local HTTP server speaking the parts of the Mistral API the agent uses
+    (chat completions, streamed or not, and embeddings), plus 200 on any
+    GET/HEAD so it doubles as a sentinel probe target. Model behaviour is
+    emulated too: a fixed wait before the first token, then a steady
+    token rate. Network behaviour is the emulator's job, not the server's.
+    """
+
+    def __init__(self, first_token_delay=0.25, tokens_per_second=60, answer_words=80, router_answer="NONE"):
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.answer_words = answer_words
+        self.router_answer = router_answer
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stand_in = self
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="stand-in-server", daemon=True).start()
+        print(f"[EMULATOR] Stand-in Mistral API on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def server_baseline(self):
+        """Server time per call, in the sentinel's SENTINEL_SERVER_BASELINE format."""
+        return {"mistral-embed": (0, 0), "default": (self.first_token_delay * 1000, 0)}
+
+    def _answer(self, body):
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        if "intent classification" in prompt:
+            return self.router_answer
+        return " ".join(f"word{i}" for i in range(self.answer_words)) + "."
+
+    def _usage(self, body, answer):
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(answer) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def completion_response(self, body):
+        answer = self._answer(body)
+        time.sleep(self.first_token_delay + len(answer.split()) / self.tokens_per_second)
+        return {
+            "id": "stand-in", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": self._usage(body, answer),
+        }
+
+    def stream_chunks(self, body):
+        """Yields (delay before it, SSE payload) per event, ending with usage and [DONE]."""
+        answer = self._answer(body)
+        words = answer.split(" ")
+        limit = body.get("max_tokens")
+        if limit:
+            words = words[:limit]
+        for i, word in enumerate(words):
+            delta = word if i == 0 else " " + word
+            chunk = {
+                "id": "stand-in", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": delta}, "finish_reason": None}],
+            }
+            yield (self.first_token_delay if i == 0 else 1 / self.tokens_per_second), json.dumps(chunk)
+        final = {
+            "id": "stand-in", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model"),
+            "choices": [{"index": 0, "delta": {"content": ""}, "finish_reason": "stop"}],
+            "usage": self._usage(body, " ".join(words)),
+        }
+        yield 0, json.dumps(final)
+        yield 0, "[DONE]"
+
+    def embedding_response(self, body):
+        inputs = body.get("input") or body.get("inputs") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for index, text in enumerate(inputs):
+            # Deterministic, so identical texts embed identically (the response cache relies on it)
+            digest = hashlib.sha256(text.encode()).digest()
+            data.append({"object": "embedding", "index": index, "embedding": [b / 255 for b in digest[:16]]})
+        tokens = sum(len(t) // 4 for t in inputs)
+        return {"id": "stand-in", "object": "list", "model": body.get("model"), "data": data,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+
+class StandInSearch:
+    """Drop-in for the pool's DDGS: canned text results, no network of its own."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def text(self, query, region=None, max_results=8):
+        return [{"title": f"Result {i} for {query}", "href": f"https://example.com/{i}",
+                 "body": f"Stand-in snippet {i} about {query}."} for i in range(max_results)]
+
+    def news(self, query, region=None, max_results=8):
+        return self.text(query, region, max_results)
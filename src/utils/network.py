@@ -1,44 +1,343 @@
+import asyncio
+import math
+import socket
+import ssl
+import threading
 import time
-import requests
+import httpx
 import statistics
+from collections import deque
+from urllib.parse import urlsplit
 from termcolor import colored
+from config import (
+    LATENCY_THRESHOLD_FAST, LATENCY_THRESHOLD_POOR,
+    SENTINEL_PROBE_INTERVAL, SENTINEL_EWMA_ALPHA, SENTINEL_WINDOW,
+    SENTINEL_TARGETS, SENTINEL_PROBE_TIMEOUT, SENTINEL_PROBE_MODE, SENTINEL_HYSTERESIS, SENTINEL_MIN_TAIL_SAMPLES,
+    SENTINEL_SERVER_BASELINE, SENTINEL_MIN_TOKENS_PER_SECOND, SENTINEL_THROUGHPUT_WINDOW, SENTINEL_PASSIVE_FRESH, SENTINEL_MAX_PROBE_INTERVAL,
+)
+from src.utils.async_bridge import run_sync
+from src.utils.http_pool import get_shared_pool
+
+# Best first. Each mode's latency ceiling is the threshold that ends it.
+MODES = ["DEEP_REASONING", "STANDARD", "FAST_RESPONSE"]
+CEILINGS = [LATENCY_THRESHOLD_FAST, LATENCY_THRESHOLD_POOR]
+
+
+def phase_probe(url, tcp_only=False, timeout=SENTINEL_PROBE_TIMEOUT):
+    """
+    Times one fresh connection to `url`, phase by phase (ms): dns, connect,
+    tls (https only) and ttfb (request sent -> first byte of the response).
+    `tcp_only` stops after connect. "rtt" is the phase decisions use: the
+    connect for a TCP probe, the TTFB otherwise (what a warm request costs).
+    Raises OSError (including ssl errors and timeouts) on failure.
+    """
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    phases = {}
+    mark = time.monotonic()
+
+    def lap(name):
+        nonlocal mark
+        now = time.monotonic()
+        phases[name] = round((now - mark) * 1000, 1)
+        mark = now
+
+    family, kind, proto, _, address = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)[0]
+    lap("dns")
+    sock = socket.socket(family, kind, proto)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+        lap("connect")
+        if tcp_only:
+            phases["rtt"] = phases["connect"]
+            return phases
+
+        if https:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+            lap("tls")
+        request = f"HEAD {parts.path or '/'} HTTP/1.1\r\nHost: {parts.hostname}\r\nConnection: close\r\n\r\n"
+        sock.sendall(request.encode())
+        if not sock.recv(1):
+            raise OSError("connection closed before any response")
+        lap("ttfb")
+        phases["rtt"] = phases["ttfb"]
+        return phases
+    finally:
+        sock.close()
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list (q in 0..1)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * q) - 1)]
+
 
 class NetworkSentinel:
-    def __init__(self, target_url="https://1.1.1.1"):
-        self.target = target_url
+    """
+    Watches network health from a background daemon thread. Every
+    SENTINEL_PROBE_INTERVAL seconds it probes all SENTINEL_TARGETS at once;
+    the round's latency is the median of the targets that answered, so one
+    slow or dead host does not decide for the rest.
+    The mode follows the median and p90 of the last SENTINEL_WINDOW rounds
+    against LATENCY_THRESHOLD_FAST/POOR, with SENTINEL_HYSTERESIS bands
+    around each threshold so it does not flap. Readers (the UI, every
+    request in Auto mode) only read the cached verdict.
+    Real traffic feeds the same window: LLMGateway reports time-to-first-
+    token and embedding round trips (minus the server time expected for
+    the model and prompt size, SENTINEL_SERVER_BASELINE) and stream
+    throughput. While that data is fresh, active probing backs off, so
+    under load it nearly stops.
+    """
 
-    def ping(self, runs=3):
+    def __init__(self, targets=None, pool=None, interval=SENTINEL_PROBE_INTERVAL, probe_mode=SENTINEL_PROBE_MODE,
+                 window=SENTINEL_WINDOW, passive_fresh=SENTINEL_PASSIVE_FRESH, server_baseline=SENTINEL_SERVER_BASELINE,
+                 throughput_window=SENTINEL_THROUGHPUT_WINDOW):
+        self.targets = list(targets or SENTINEL_TARGETS)
+        self.server_baseline = server_baseline
+        self.probe_mode = probe_mode
+        self.passive_fresh = passive_fresh
+        # Probes ride the shared keep-alive pool instead of a fresh handshake each time
+        self.pool = pool or get_shared_pool()
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.ewma = None
+        self.samples = deque(maxlen=window)
+        self.throughput = deque(maxlen=throughput_window)  # Tokens/s of recent answer streams
+        self.last = {t: None for t in self.targets}  # Latest phases (ms) per target, None = failed
+        self.failures = {t: 0 for t in self.targets}
+        self.mode = "STANDARD"  # Until the first probe lands
+        self.last_probe = None
+        self.last_passive = None
+        self.counts = {"probes": 0, "probes_skipped": 0, "passive": 0}
+        self.transitions = deque(maxlen=100)  # (monotonic time, from mode, to mode)
+        self._thread = None
+        self._stop = threading.Event()
+
+    # --- Probing ---
+    async def _probe(self, target, probe_mode):
+        """Returns {phase: ms} including "rtt", or None if the target did not answer."""
+        if probe_mode == "keepalive":
+            # HEAD, no redirects: no body to download, and the pooled connection is reused
+            start = time.monotonic()
+            try:
+                response = await self.pool.async_client.head(target, timeout=SENTINEL_PROBE_TIMEOUT, follow_redirects=False)
+            except httpx.HTTPError:
+                return None
+            # A replayed probe carries the RTT it was recorded with
+            seconds = response.extensions.get("recorded_seconds", time.monotonic() - start)
+            rtt = round(seconds * 1000, 1)
+            return {"request": rtt, "rtt": rtt}
+
+        try:
+            # Blocking sockets (DNS has no timeout of its own), so off the event loop and bounded here
+            return await asyncio.wait_for(
+                asyncio.to_thread(phase_probe, target, tcp_only=probe_mode == "tcp"),
+                timeout=SENTINEL_PROBE_TIMEOUT * 2
+            )
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+    async def probe_round(self, probe_mode=None):
+        """Probes every target concurrently. Returns {target: phases or None}."""
+        probe_mode = probe_mode or self.probe_mode
+        results = await asyncio.gather(*(self._probe(t, probe_mode) for t in self.targets))
+        return dict(zip(self.targets, results))
+
+    def diagnose(self):
+        """One phase-resolved round on fresh connections: is slowness DNS, handshake or server-side?"""
+        return run_sync(self.probe_round("phases"))
+
+    def ping(self):
         """
-        Pings a high-availability server to estimate RTT (Round Trip Time).
-        Returns: Average latency in milliseconds (ms).
+        One probe round. Returns: the median latency of the targets that
+        answered (ms), or the probe timeout if none did.
         """
-        latencies = []
-        try:
-            for _ in range(runs):
-                start = time.time()
-                requests.get(self.target, timeout=2)
-                latencies.append((time.time() - start) * 1000)
-            
-            avg_latency = statistics.mean(latencies)
-            return avg_latency
-        except requests.RequestException:
-            return 9999.0  # Max latency on failure
+        results = run_sync(self.probe_round())
+        with self.lock:
+            for target, phases in results.items():
+                self.last[target] = phases
+                self.failures[target] += phases is None
+        answered = [p["rtt"] for p in results.values() if p is not None]
+        if not answered:
+            return SENTINEL_PROBE_TIMEOUT * 1000  # Nothing reachable: as slow as we can measure
+        return statistics.median(answered)
+
+    # --- Background probing ---
+    def start(self):
+        """
+        Starts the probe thread (once). Under a cassette probes are recorded
+        and replayed like any other call, so only the pooled HEAD probe is
+        used (raw-socket probes would bypass it). Replayed probes report
+        their recorded RTT; a fast replay has no real timing, so it feeds
+        no passive measurements.
+        """
+        if self._thread is not None:
+            return self
+        cassette = self.pool.cassette
+        if cassette:
+            self.probe_mode = "keepalive"
+        if not (cassette and cassette.mode == "replay" and cassette.timing != "original"):
+            self.pool.llm.sentinel = self  # Passive measurements from real traffic
+        self._thread = threading.Thread(target=self._run, name="network-sentinel", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        interval = self.interval
+        while not self._stop.is_set():
+            if self._passive_is_fresh():
+                # Real calls already tell us how the link is doing
+                self.counts["probes_skipped"] += 1
+                interval = min(interval * 2, SENTINEL_MAX_PROBE_INTERVAL)
+            else:
+                self.counts["probes"] += 1
+                self.observe(self.ping())
+                self.last_probe = time.monotonic()
+                interval = self.interval
+            self._stop.wait(interval)
+
+    def _passive_is_fresh(self):
+        return self.last_passive is not None and time.monotonic() - self.last_passive < self.passive_fresh
+
+    def record_passive(self, kind, value, model=None, prompt_tokens=0):
+        """
+        Called by LLMGateway for every real call: "ttft" / "embedding" in ms,
+        "tokens_per_second" for a finished stream.
+        """
+        self.last_passive = time.monotonic()
+        self.counts["passive"] += 1
+        if kind == "tokens_per_second":
+            with self.lock:
+                self.throughput.append(value)
+            self._redecide()
+            return
+        self.observe(max(0.0, value - self.server_time(model, prompt_tokens)))
+
+    def server_time(self, model, prompt_tokens=0):
+        """Expected ms the server spends before answering (fixed cost plus prefill)."""
+        fixed, per_1k = self.server_baseline.get(model, self.server_baseline["default"])
+        return fixed + per_1k * prompt_tokens / 1000
+
+    def observe(self, latency):
+        """Folds one latency (ms, RTT-equivalent) into the window and the EWMA, and re-decides the mode."""
+        with self.lock:
+            self.samples.append(latency)
+            if self.ewma is None:
+                self.ewma = latency
+            else:
+                self.ewma = SENTINEL_EWMA_ALPHA * latency + (1 - SENTINEL_EWMA_ALPHA) * self.ewma
+        self._redecide()
+
+    def _redecide(self):
+        """Re-decides the mode from the current window (latency and throughput)."""
+        with self.lock:
+            if not self.samples:
+                return
+            median = statistics.median(self.samples)
+            # A tail needs enough rounds to mean anything; before that p90 is just the worst one
+            p90 = percentile(self.samples, 0.9) if len(self.samples) >= SENTINEL_MIN_TAIL_SAMPLES else None
+            tokens_per_second = statistics.median(self.throughput) if self.throughput else None
+            previous = self.mode
+            self.mode = self._decide(previous, median, p90, tokens_per_second)
+            if self.mode != previous:
+                self.transitions.append((time.monotonic(), previous, self.mode))
+
+        if self.mode != previous:
+            print(f"[SYSTEM] Network Status: {self.status(median)} (p50 {int(median)}ms) -> Mode: {self.mode}")
+
+    def _decide(self, current, median, p90, tokens_per_second=None):
+        """
+        Moves at most as far as the median says, crossing each threshold
+        only once it is SENTINEL_HYSTERESIS past it. Deep reasoning also
+        needs a tail (p90) below the POOR threshold and streams of at least
+        SENTINEL_MIN_TOKENS_PER_SECOND: long answers are what a jittery or
+        slow link hurts most.
+        """
+        index = MODES.index(current)
+        up, down = 1 + SENTINEL_HYSTERESIS, 1 - SENTINEL_HYSTERESIS
+
+        # Worse: past the current mode's ceiling by the band
+        while index < len(MODES) - 1 and median > CEILINGS[index] * up:
+            index += 1
+        # Better: under the next better mode's ceiling by the band
+        while index > 0 and median < CEILINGS[index - 1] * down:
+            index -= 1
+
+        if index == 0 and p90 is not None and p90 > LATENCY_THRESHOLD_POOR:
+            index = 1
+        if index == 0 and tokens_per_second is not None and tokens_per_second < SENTINEL_MIN_TOKENS_PER_SECOND:
+            index = 1
+        return MODES[index]
+
+    def reset(self):
+        """
+        Forgets every measurement, e.g. after moving to a different network.
+        The current mode stands until new measurements decide otherwise.
+        """
+        with self.lock:
+            self.samples.clear()
+            self.throughput.clear()
+            self.ewma = None
+            self.last_passive = None
+
+    # --- Cached reads (O(1), never block on the network) ---
+    def latency(self):
+        """EWMA latency in ms, or None before the first probe."""
+        return self.ewma
 
     def get_mode(self):
         """
         Decides the reasoning strategy based on current network health.
         """
-        latency = self.ping()
-        
-        if latency < 300:
-            status = colored(f"STRONG ({int(latency)}ms)", "green")
-            mode = "DEEP_REASONING"
-        elif latency < 1000:
-            status = colored(f"MODERATE ({int(latency)}ms)", "yellow")
-            mode = "STANDARD"
-        else:
-            status = colored(f"POOR ({int(latency)}ms)", "red")
-            mode = "FAST_RESPONSE"
-            
-        print(f"[SYSTEM] Network Status: {status} -> Mode: {mode}")
-        return mode
\ No newline at end of file
+        return self.mode
+
+    def percentiles(self):
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            return {}
+        return {"p50": round(statistics.median(samples), 1), "p90": round(percentile(samples, 0.9), 1)}
+
+    def snapshot(self):
+        with self.lock:
+            tokens_per_second = statistics.median(self.throughput) if self.throughput else None
+        return {
+            "mode": self.mode,
+            "ewma_ms": None if self.ewma is None else round(self.ewma, 1),
+            **self.percentiles(),
+            "samples": len(self.samples),
+            "probe_age_s": None if self.last_probe is None else round(time.monotonic() - self.last_probe, 1),
+            "passive_age_s": None if self.last_passive is None else round(time.monotonic() - self.last_passive, 1),
+            "tokens_per_second": None if tokens_per_second is None else round(tokens_per_second, 1),
+            **self.counts,
+            "probe_mode": self.probe_mode,
+            "targets": {t: {"phases_ms": phases, "failures": self.failures[t]} for t, phases in self.last.items()},
+        }
+
+    def status(self, latency=None):
+        latency = self.ewma if latency is None else latency
+        if latency is None:
+            return colored("UNKNOWN (no probe yet)", "white")
+        if latency < LATENCY_THRESHOLD_FAST:
+            return colored(f"STRONG ({int(latency)}ms)", "green")
+        if latency < LATENCY_THRESHOLD_POOR:
+            return colored(f"MODERATE ({int(latency)}ms)", "yellow")
+        return colored(f"POOR ({int(latency)}ms)", "red")
+
+
+_sentinel = None
+_sentinel_lock = threading.Lock()
+
+
+def get_sentinel(pool=None, **options):
+    """Process-wide sentinel, probing in the background from first use. `options` apply to that first use."""
+    global _sentinel
+    with _sentinel_lock:
+        if _sentinel is None:
+            _sentinel = NetworkSentinel(pool=pool, **options).start()
+    return _sentinel
@@ -0,0 +1,173 @@
+import asyncio
+import random
+import time
+from collections import deque
+import httpx
+
+# 429 = provider rate limit, 5xx = provider hiccup. Everything else (400, 401,
+# 422...) is our fault and retrying it only burns budget.
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error):
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in TRANSIENT_STATUS
+
+
+class LatencyTracker:
+    """Sliding window of recent call durations (seconds)."""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class RetryBudget:
+    """
+    Token bucket that caps extra attempts (retries + hedges) to a fraction of
+    real traffic. Every request deposits `ratio` tokens, every extra attempt
+    withdraws one. When the provider is struggling, the bucket drains and we
+    stop piling duplicate load on top of it.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class RequestPolicy:
+    """
+    Per-endpoint call policy:
+    - Hedging: if a call outlives the endpoint's observed p95, fire one
+      duplicate, take whichever answers first and cancel the other.
+    - Retries: transient errors get jittered exponential backoff.
+    - Budget: hedges and retries both draw from one RetryBudget.
+    """
+
+    def __init__(self, name, max_attempts=3, base_delay=0.25, max_delay=4.0,
+                 hedge=True, hedge_min_samples=20, budget_ratio=0.1):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.budget = RetryBudget(ratio=budget_ratio)
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "budget_denied": 0}
+
+    def hedge_delay(self):
+        if not self.hedge or len(self.latency.samples) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(95)
+
+    async def call(self, factory, cleanup=None):
+        """
+        Runs `factory()` (a coroutine factory) under the policy and returns its
+        result. `cleanup(result)` is awaited for a hedge loser that finished
+        anyway, so it can release what it holds (e.g. an open stream).
+        """
+        self.stats["calls"] += 1
+        self.budget.deposit()
+
+        attempt = 1
+        while True:
+            start = time.monotonic()
+            try:
+                result = await self._hedged(factory, cleanup)
+                self.latency.record(time.monotonic() - start)
+                return result
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_attempts:
+                    raise
+                if not self.budget.withdraw():
+                    self.stats["budget_denied"] += 1
+                    print(f"[POLICY] {self.name}: retry budget exhausted, giving up on {type(e).__name__}.")
+                    raise
+
+                # Full jitter: uniform(0, base * 2^attempt), capped
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self.stats["retries"] += 1
+                print(f"[POLICY] {self.name}: transient {type(e).__name__}, retry {attempt}/{self.max_attempts - 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _hedged(self, factory, cleanup):
+        primary = asyncio.create_task(factory())
+        tasks = [primary]
+        winner = None
+
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+
+            if delay is None or primary.done() or not self._allow_hedge():
+                winner = primary
+                return await primary
+
+            print(f"[POLICY] {self.name}: no answer after p95 ({delay * 1000:.0f}ms), sending hedge.")
+            backup = asyncio.create_task(factory())
+            tasks.append(backup)
+            pending = set(tasks)
+            error = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is backup:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel the loser; if it already finished, release what it holds
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif cleanup and not task.cancelled() and task.exception() is None:
+                    await cleanup(task.result())
+
+    def _allow_hedge(self):
+        if self.budget.withdraw():
+            self.stats["hedges"] += 1
+            return True
+        self.stats["budget_denied"] += 1
+        return False
+
+
+_policies = {}
+
+
+def get_policy(name, **kwargs):
+    """One policy per endpoint name, shared process-wide so its stats mean something."""
+    if name not in _policies:
+        _policies[name] = RequestPolicy(name, **kwargs)
+    return _policies[name]
+
+
+def policy_stats():
+    return {name: dict(p.stats, p95_ms=round((p.latency.percentile(95) or 0) * 1000)) for name, p in _policies.items()}
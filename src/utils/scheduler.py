@@ -0,0 +1,146 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from config import SCHEDULER_RATE_LIMITS, SCHEDULER_DEFAULT_RATE, SCHEDULER_PRIORITIES
+from src.utils.request_policy import LatencyTracker
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; one token = one request."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def wait_time(self):
+        """Seconds until the next token."""
+        self._refill()
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+
+class ModelQueue:
+    """
+    Waiting requests for one model: one lane per priority class, and inside
+    a lane one FIFO per session, served round-robin so a session that fires
+    fifty calls cannot starve one that fires a single call.
+    """
+
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.lanes = {p: OrderedDict() for p in sorted(set(SCHEDULER_PRIORITIES.values()))}
+        self.timer = None
+
+    def depth(self, priority=None):
+        lanes = [self.lanes[priority]] if priority is not None else self.lanes.values()
+        return sum(len(q) for lane in lanes for q in lane.values())
+
+    def push(self, priority, session, waiter):
+        self.lanes[priority].setdefault(session, deque()).append(waiter)
+
+    def pop(self):
+        """Next waiter: highest priority lane first, then the session whose turn it is."""
+        for lane in self.lanes.values():
+            while lane:
+                session, queue = next(iter(lane.items()))
+                waiter = queue.popleft()
+                # Rotate: this session goes to the back of its lane
+                del lane[session]
+                if queue:
+                    lane[session] = queue
+                if not waiter[0].cancelled():
+                    return waiter
+        return None
+
+
+class Scheduler:
+    """
+    Central admission point for every Mistral call.
+    Each model has a token bucket sized to the provider's rate limit, so we
+    queue locally instead of collecting 429s. When a model is saturated,
+    interactive calls (FAST_RESPONSE, then STANDARD, then DEEP_REASONING)
+    are admitted before background work, and sessions within a class take
+    turns. Runs on the shared event loop; no locking needed.
+    """
+
+    def __init__(self, rate_limits=SCHEDULER_RATE_LIMITS, default_rate=SCHEDULER_DEFAULT_RATE):
+        self.rate_limits = rate_limits
+        self.default_rate = default_rate
+        self.queues = {}
+        self.wait_times = {p: LatencyTracker() for p in SCHEDULER_PRIORITIES}
+        self.stats = {"admitted": 0, "queued": 0, "max_depth": 0}
+
+    def _queue(self, model):
+        if model not in self.queues:
+            self.queues[model] = ModelQueue(*self.rate_limits.get(model, self.default_rate))
+        return self.queues[model]
+
+    async def admit(self, model, priority="STANDARD", session=None):
+        """Returns once `model` has capacity for one more request from this caller."""
+        queue = self._queue(model)
+        self.stats["admitted"] += 1
+
+        # Fast path: capacity available and nobody is waiting ahead of us
+        if not queue.depth() and queue.bucket.take():
+            self.wait_times[priority].record(0.0)
+            return
+
+        waiter = (asyncio.get_running_loop().create_future(), priority, time.monotonic())
+        queue.push(SCHEDULER_PRIORITIES[priority], session, waiter)
+        self.stats["queued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], queue.depth())
+        if queue.timer is None:
+            self._pump(model)
+        await waiter[0]
+
+    def _pump(self, model):
+        """Hands free tokens to waiters in priority order, then sleeps until the next token."""
+        queue = self.queues[model]
+        queue.timer = None
+        while queue.depth():
+            if not queue.bucket.take():
+                queue.timer = asyncio.get_running_loop().call_later(queue.bucket.wait_time(), self._pump, model)
+                return
+            waiter = queue.pop()
+            if waiter is None:
+                queue.bucket.tokens += 1.0  # Everyone left had given up; return the token
+                return
+            future, priority, queued_at = waiter
+            self.wait_times[priority].record(time.monotonic() - queued_at)
+            future.set_result(None)
+
+    def snapshot(self):
+        """Queue depth per model and priority, plus p50/p95 admission wait per priority (ms)."""
+        names = {v: k for k, v in SCHEDULER_PRIORITIES.items()}
+        return {
+            "queues": {model: {names[p]: q.depth(p) for p in q.lanes} for model, q in self.queues.items()},
+            "wait_ms": {
+                p: {"p50": round((t.percentile(50) or 0) * 1000), "p95": round((t.percentile(95) or 0) * 1000)}
+                for p, t in self.wait_times.items() if t.samples
+            },
+            **self.stats,
+        }
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Process-wide scheduler: rate limits are per API key, not per agent."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler()
+    return _scheduler
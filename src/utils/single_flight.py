@@ -0,0 +1,152 @@
+import asyncio
+
+
+class FlightCancelled(Exception):
+    """The shared stream was cancelled because every reader had left; what it produced is incomplete."""
+
+
+class _Call:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """
+    One upstream stream, many readers. Every chunk is buffered, so a reader
+    that joins late first replays the prefix and then follows live.
+    """
+
+    def __init__(self, source, on_cancel=None):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cancelled = False
+        self.on_cancel = on_cancel
+        self.readers = 0
+        self.changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(source))
+
+    def _notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def _pump(self, source):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            # Also runs when the last reader left and we were cancelled: closes the upstream stream
+            await source.aclose()
+            self.done = True
+            self._notify()
+
+    async def read(self):
+        self.readers += 1
+        position = 0
+        try:
+            while True:
+                if self.cancelled:
+                    # Never pass a cut-off prefix off as a complete answer
+                    raise FlightCancelled("shared stream was cancelled")
+                if position < len(self.chunks):
+                    yield self.chunks[position]
+                    position += 1
+                elif self.done:
+                    if self.error:
+                        raise self.error
+                    return
+                else:
+                    await self.changed.wait()
+        finally:
+            self.readers -= 1
+            if not self.readers and not self.done and not self.cancelled:
+                self.cancelled = True
+                self.task.cancel()
+                if self.on_cancel:
+                    self.on_cancel()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight work. The first caller for a key (the
+    leader) starts it; callers arriving while it runs (followers) attach to
+    the same result instead of repeating the upstream call. The work is
+    cancelled only when every caller waiting on it has gone. Keys are
+    forgotten as soon as the work finishes: this is deduplication, not a cache.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def _track(self, key, entry, task):
+        self.calls[key] = entry
+        self.stats["leaders"] += 1
+        task.add_done_callback(lambda _: self._forget(key, entry))
+
+    def _forget(self, key, entry):
+        if self.calls.get(key) is entry:
+            del self.calls[key]
+
+    def _join(self, key):
+        entry = self.calls.get(key)
+        if entry is not None:
+            self.stats["followers"] += 1
+            print(f"[FLIGHT] {self.name}: joined in-flight call ({self.stats['followers']} coalesced so far)")
+        return entry
+
+    async def do(self, key, factory):
+        """Awaits `factory()` once per key, however many callers ask concurrently."""
+        call = self._join(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._track(key, call, call.task)
+
+        call.waiters += 1
+        try:
+            # Shielded: one caller timing out must not cancel the others' result
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # Forgotten at once: a caller arriving now must start fresh, not join a dying call
+                self._forget(key, call)
+                call.task.cancel()
+
+    async def stream(self, key, factory):
+        """Async generator over one shared `factory()` stream per key."""
+        broadcast = self._join(key)
+        if broadcast is None:
+            broadcast = _Broadcast(factory())
+            broadcast.on_cancel = lambda: self._forget(key, broadcast)
+            self._track(key, broadcast, broadcast.task)
+
+        reader = broadcast.read()
+        try:
+            async for chunk in reader:
+                yield chunk
+        finally:
+            await reader.aclose()
+            if broadcast.cancelled:
+                # We were the last reader: wait for the upstream teardown, so what
+                # the stream cost is booked before our caller takes its usage snapshot
+                await asyncio.gather(broadcast.task, return_exceptions=True)
+
+
+_flights = {}
+
+
+def get_flight(name):
+    """One SingleFlight per layer, shared process-wide so separate sessions coalesce."""
+    if name not in _flights:
+        _flights[name] = SingleFlight(name)
+    return _flights[name]
+
+
+def flight_stats():
+    return {name: dict(f.stats, in_flight=len(f.calls)) for name, f in _flights.items()}
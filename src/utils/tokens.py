@@ -0,0 +1,23 @@
+import re
+
+# Mistral's tokenizer averages roughly 4 characters per token on English text.
+# Good enough for budgeting; nothing here needs to be exact.
+CHARS_PER_TOKEN = 4
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate: the larger of a char-based and a word/punctuation-based count."""
+    if not text:
+        return 0
+    return max(len(text) // CHARS_PER_TOKEN, len(TOKEN_PATTERN.findall(text)))
+
+
+def trim_to_tokens(text, max_tokens, keep_end=False):
+    """Cuts `text` so that estimate_tokens(text) <= max_tokens, keeping the beginning (or the end)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[-max_tokens * CHARS_PER_TOKEN:] if keep_end else text[:max_tokens * CHARS_PER_TOKEN]
+    while cut and estimate_tokens(cut) > max_tokens:
+        cut = cut[-int(len(cut) * 0.9):] if keep_end else cut[:int(len(cut) * 0.9)]
+    return cut
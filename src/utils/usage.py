@@ -0,0 +1,126 @@
+import itertools
+import threading
+from collections import OrderedDict, defaultdict
+from config import MODEL_PRICES, USAGE_RECENT_REQUESTS
+
+
+def cost_of(model, prompt_tokens, completion_tokens):
+    """USD cost at MODEL_PRICES (per 1M tokens); unknown models count as free."""
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+class UsageTotals:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_calls = 0  # Calls whose numbers came from our tokenizer estimate
+        self.cost = 0.0
+
+    def add(self, model, prompt_tokens, completion_tokens, estimated):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.estimated_calls += int(estimated)
+        self.cost += cost_of(model, prompt_tokens, completion_tokens)
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "estimated_calls": self.estimated_calls,
+            "cost_usd": round(self.cost, 6),
+        }
+
+
+class RequestUsage:
+    """Everything one execute_stream call spent, broken down by kind of call."""
+
+    def __init__(self, request_id, session, mode=None):
+        self.request_id = request_id
+        self.session = session
+        self.mode = mode  # Set once the pipeline has chosen the effective mode
+        self.total = UsageTotals()
+        self.by_kind = defaultdict(UsageTotals)
+
+    def as_dict(self):
+        return {
+            "request_id": self.request_id,
+            "session": self.session,
+            "mode": self.mode,
+            **self.total.as_dict(),
+            "by_kind": {kind: t.as_dict() for kind, t in self.by_kind.items()},
+        }
+
+
+class UsageLedger:
+    """
+    Process-wide token ledger. LLMGateway records every Mistral call here
+    (provider-reported usage when the response carries it, a tokenizer
+    estimate otherwise), aggregated per session, per mode, per model and
+    per kind of call, plus the last USAGE_RECENT_REQUESTS requests.
+    """
+
+    def __init__(self, recent=USAGE_RECENT_REQUESTS):
+        self.lock = threading.Lock()
+        self.total = UsageTotals()
+        self.by_session = defaultdict(UsageTotals)
+        self.by_mode = defaultdict(UsageTotals)
+        self.by_model = defaultdict(UsageTotals)
+        self.by_kind = defaultdict(UsageTotals)
+        self.requests = OrderedDict()
+        self.recent = recent
+        self._ids = itertools.count(1)
+
+    def start_request(self, session, mode=None):
+        with self.lock:
+            request = RequestUsage(f"req-{next(self._ids)}", session, mode)
+            self.requests[request.request_id] = request
+            while len(self.requests) > self.recent:
+                self.requests.popitem(last=False)
+        return request
+
+    def record(self, kind, model, prompt_tokens, completion_tokens, estimated=False,
+               session=None, mode=None, request=None):
+        if request is not None:
+            session = request.session
+            mode = request.mode or mode
+        with self.lock:
+            for totals in (self.total, self.by_session[session], self.by_mode[mode],
+                           self.by_model[model], self.by_kind[kind]):
+                totals.add(model, prompt_tokens, completion_tokens, estimated)
+            if request is not None:
+                request.total.add(model, prompt_tokens, completion_tokens, estimated)
+                request.by_kind[kind].add(model, prompt_tokens, completion_tokens, estimated)
+
+    def summary(self):
+        with self.lock:
+            return {
+                "total": self.total.as_dict(),
+                "by_mode": {str(k): t.as_dict() for k, t in self.by_mode.items()},
+                "by_model": {k: t.as_dict() for k, t in self.by_model.items()},
+                "by_kind": {k: t.as_dict() for k, t in self.by_kind.items()},
+                "sessions": len(self.by_session),
+            }
+
+    def session_usage(self, session):
+        with self.lock:
+            return self.by_session[session].as_dict() if session in self.by_session else None
+
+    def request_usage(self, request_id):
+        with self.lock:
+            request = self.requests.get(request_id)
+            return request.as_dict() if request else None
+
+
+_ledger = UsageLedger()
+
+
+def get_ledger():
+    return _ledger
+
+
+def usage_summary():
+    return _ledger.summary()
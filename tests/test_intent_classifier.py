@@ -0,0 +1,39 @@
+import pytest
+from config import INTENT_CONFIDENCE_THRESHOLD
+from src.core.intent_classifier import IntentClassifier
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize("query", [
+    "create a pdf report on climate change",
+    "make a word document about project management",
+    "export the results to a spreadsheet",
+    "save this as a pdf",
+    "please create a pdf about today's news",
+])
+def test_imperative_file_requests_route_to_doc(classifier, query):
+    assert classifier.classify(query) == ("DOC", 0.97)
+
+
+@pytest.mark.parametrize("query", [
+    "how do I make a pdf smaller",
+    "explain how to export data to excel in pandas",
+    "write the word hello in french",
+])
+def test_questions_about_file_formats_are_not_doc(classifier, query):
+    intent, _ = classifier.classify(query)
+    assert intent != "DOC"
+
+
+@pytest.mark.parametrize("query", [
+    "price elasticity of demand",
+    "electric current in a wire",
+    "open the file in python",
+])
+def test_ambiguous_keywords_defer_to_the_llm_router(classifier, query):
+    _, confidence = classifier.classify(query)
+    assert confidence < INTENT_CONFIDENCE_THRESHOLD